@@ -3,7 +3,8 @@ import json
 import logging
 import random
 import time
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 
 from twitchio.ext import commands
 
@@ -12,38 +13,71 @@ from jishbot.app.services import (
     commands_service,
     counters_service,
     giveaways_service,
+    metrics_service,
     moderation_service,
+    outbound_service,
     permissions_service,
     timers_service,
     twitch_api_service,
 )
+from jishbot.app.services.permissions_service import PermissionLevel
 from jishbot.app.settings import settings
 
 log = logging.getLogger(__name__)
 
-BUILTIN_HELP = [
-    {"label": "!commands", "perm": "everyone"},
-    {"label": "!help", "perm": "everyone"},
-    {"label": "!uptime", "perm": "everyone"},
-    {"label": "!game", "perm": "everyone"},
-    {"label": "!title", "perm": "everyone"},
-    {"label": "!accountage", "perm": "everyone"},
-    {"label": "!followage", "perm": "everyone"},
-    {"label": "!8ball", "perm": "everyone"},
-    {"label": "!marker", "perm": "moderator"},
-    {"label": "!regular", "perm": "moderator"},
-    {"label": "!command", "perm": "moderator"},
-    {"label": "!timer", "perm": "moderator"},
-    {"label": "!giveaway", "perm": "moderator"},
-    {"label": "!counter", "perm": "moderator"},
-    {"label": "!slow / !slowoff", "perm": "moderator"},
-    {"label": "!emoteonly / !emoteoff", "perm": "moderator"},
-    {"label": "!clear", "perm": "moderator"},
-    {"label": "!shoutout", "perm": "moderator"},
-    {"label": "!permit", "perm": "moderator"},
-    {"label": "!poll", "perm": "moderator"},
-    {"label": "!prediction", "perm": "moderator"},
-]
+MODERATION = outbound_service.Priority.MODERATION
+NOTICE = outbound_service.Priority.NOTICE
+
+BuiltinHandler = Callable[..., Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class BuiltinCommand:
+    name: str
+    handler: BuiltinHandler
+    permission: PermissionLevel = "everyone"
+    # Stricter permission that applies only when arguments are given (e.g. !game <new game>)
+    args_permission: Optional[PermissionLevel] = None
+    aliases: Tuple[str, ...] = ()
+    min_args: int = 0
+    usage: str = ""
+    help_label: str = ""
+
+
+# name/alias -> spec, filled by @builtin in JishBot's class body
+BUILTINS: Dict[str, BuiltinCommand] = {}
+_builtin_order: List[BuiltinCommand] = []
+
+
+def builtin(
+    name: str,
+    *,
+    permission: PermissionLevel = "everyone",
+    args_permission: Optional[PermissionLevel] = None,
+    aliases: Tuple[str, ...] = (),
+    min_args: int = 0,
+    usage: str = "",
+    help_label: Optional[str] = None,
+) -> Callable[[BuiltinHandler], BuiltinHandler]:
+    """Register a JishBot method as a built-in chat command. help_label="" hides it from !help."""
+
+    def decorator(func: BuiltinHandler) -> BuiltinHandler:
+        spec = BuiltinCommand(
+            name=name,
+            handler=func,
+            permission=permission,
+            args_permission=args_permission,
+            aliases=aliases,
+            min_args=min_args,
+            usage=usage,
+            help_label=f"!{name}" if help_label is None else help_label,
+        )
+        for key in (name, *aliases):
+            BUILTINS[key] = spec
+        _builtin_order.append(spec)
+        return func
+
+    return decorator
 
 
 class JishBot(commands.Bot):
@@ -58,14 +92,26 @@ class JishBot(commands.Bot):
             nick=settings.twitch_bot_nick,
             token=settings.twitch_bot_token,
         )
-        self.message_queues: Dict[str, asyncio.Queue[str]] = {}
+        self.message_queues: Dict[str, outbound_service.OutboundQueue] = {}
         self.sender_tasks: Dict[str, asyncio.Task] = {}
+        metrics_service.register(
+            "outbound_queues", lambda: {name: q.stats() for name, q in self.message_queues.items()}
+        )
 
     async def event_ready(self):
         log.info("Connected to Twitch")
         for ch in self.connected_channels:
             await self._ensure_sender(ch.name)
-            await timers_service.timers_service.start(ch.name, self.queue_message)
+            await commands_service.preload(ch.name)
+            await timers_service.timers_service.start(ch.name, self.queue_timer_message)
+
+    async def event_userstate(self, user):
+        channel = getattr(user, "channel", None)
+        if channel is None:
+            return
+        channel_name = channel.name.lower()
+        privileged = bool(getattr(user, "is_mod", False)) or channel_name == settings.twitch_bot_nick.lower()
+        outbound_service.limiter.set_privileged(channel_name, privileged)
 
     async def event_message(self, message):
         if message.echo:
@@ -77,14 +123,15 @@ class JishBot(commands.Bot):
         )
 
         # Moderation
+        user_id = str(message.author.id)
         reason = await moderation_service.check_message(
             channel_id,
-            str(message.author.id),
+            user_id,
             message.author.name,
             message.content,
             message.author.is_mod,
             message.author.is_subscriber,
-            await permissions_service.is_regular(channel_id, str(message.author.id)),
+            lambda: permissions_service.is_regular(channel_id, user_id, message.author.name),
         )
         if reason:
             try:
@@ -98,17 +145,27 @@ class JishBot(commands.Bot):
     async def _ensure_sender(self, channel_name: str) -> None:
         if channel_name in self.sender_tasks:
             return
-        queue: asyncio.Queue[str] = asyncio.Queue()
+        queue = outbound_service.OutboundQueue(settings.outbound_queue_max, settings.outbound_coalesce)
         self.message_queues[channel_name] = queue
         self.sender_tasks[channel_name] = asyncio.create_task(self._sender_loop(channel_name, queue))
 
-    async def queue_message(self, channel_name: str, content: str) -> None:
+    async def queue_message(
+        self,
+        channel_name: str,
+        content: str,
+        priority: outbound_service.Priority = outbound_service.Priority.COMMAND,
+        ttl: Optional[float] = None,
+    ) -> None:
         await self._ensure_sender(channel_name)
+        queue = self.message_queues[channel_name]
         for chunk in self._chunk_message(content):
-            await self.message_queues[channel_name].put(chunk)
+            queue.put(chunk, priority, ttl)
+
+    async def queue_timer_message(self, channel_name: str, content: str) -> None:
+        await self.queue_message(channel_name, content, outbound_service.Priority.TIMER)
 
     @staticmethod
-    def _chunk_message(content: str, limit: int = 450) -> List[str]:
+    def _chunk_message(content: str, limit: int = outbound_service.MAX_MESSAGE_LENGTH) -> List[str]:
         if len(content) <= limit:
             return [content]
         chunks: List[str] = []
@@ -127,16 +184,23 @@ class JishBot(commands.Bot):
             chunks.append(remaining)
         return chunks
 
-    async def _sender_loop(self, channel_name: str, queue: asyncio.Queue[str]) -> None:
+    async def _sender_loop(self, channel_name: str, queue: outbound_service.OutboundQueue) -> None:
         while True:
-            message = await queue.get()
+            await queue.wait()
+            await outbound_service.limiter.acquire(channel_name)
+            # Pop after the token wait so anything more urgent that arrived meanwhile goes first.
+            message = queue.pop()
+            if message is None:
+                # everything queued expired during the wait; don't spend the token on nothing
+                outbound_service.limiter.release(channel_name)
+                continue
+            metrics_service.observe("outbound_queue_wait", time.monotonic() - message.enqueued_at)
             channel = self.get_channel(channel_name)
             if channel:
                 try:
-                    await channel.send(message)
+                    await channel.send(message.content)
                 except Exception:
                     log.exception("Failed to send message to %s", channel_name)
-            await asyncio.sleep(settings.message_delay_seconds)
 
     async def handle_commands(self, message):
         content = message.content.strip()
@@ -149,389 +213,363 @@ class JishBot(commands.Bot):
         args = parts[1:]
         channel_id = message.channel.name.lower()
 
-        # Built-in commands
-        if cmd == "commands":
-            names = await commands_service.list_allowed_command_names(channel_id, message)
-            snippet = ", ".join(names[:25])
-            if len(names) > 25:
-                snippet += f" (+{len(names)-25} more)"
-            await self.queue_message(channel_id, f"Commands: {snippet}")
-            return
-
-        if cmd == "help":
-            # Built-in help, filtered by permission
-            scope = args[0].lower() if args else "default"
-            help_items = []
-            for entry in BUILTIN_HELP:
-                if scope == "mod" and entry["perm"] != "moderator":
-                    continue
-                if scope == "all":
-                    pass
-                elif not await permissions_service.has_permission(message, entry["perm"]):
-                    continue
-                help_items.append(entry["label"])
-            names = await commands_service.list_allowed_command_names(channel_id, message)
-            if names:
-                help_items.append(f"Custom: {', '.join(names[:15])}" + ("" if len(names) <= 15 else " ..."))
-            await self.queue_message(channel_id, " | ".join(help_items))
-            return
-
-        if cmd == "uptime":
-            uptime = await twitch_api_service.get_stream_uptime(channel_id)
-            await self.queue_message(channel_id, uptime)
-            return
-
-        if cmd == "game":
-            if args:
-                if not await permissions_service.has_permission(message, "moderator"):
-                    return
-                new_game = " ".join(args)
-                ok = await twitch_api_service.set_channel_game(channel_id, new_game)
-                await self.queue_message(channel_id, "Game updated" if ok else "Failed to set game")
-            else:
-                info = await twitch_api_service.get_channel_info(channel_id)
-                await self.queue_message(channel_id, info["game_name"] if info else "offline")
-            return
-
-        if cmd == "title":
-            if args:
-                if not await permissions_service.has_permission(message, "moderator"):
-                    return
-                new_title = " ".join(args)
-                ok = await twitch_api_service.set_channel_title(channel_id, new_title)
-                await self.queue_message(channel_id, "Title updated" if ok else "Failed to set title")
-            else:
-                info = await twitch_api_service.get_channel_info(channel_id)
-                await self.queue_message(channel_id, info["title"] if info else "offline")
-            return
-
-        if cmd == "marker":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            desc = " ".join(args) if args else "Marked by chat"
-            ok = await twitch_api_service.create_stream_marker(desc)
-            await self.queue_message(channel_id, "Marker added." if ok else "Failed to add marker (check token/scopes/live).")
-            return
-
-        if cmd == "slow":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if not args:
-                await self.queue_message(channel_id, "Usage: !slow <seconds> (mods+)")
-                return
-            await self.queue_message(channel_id, f"/slow {args[0]}")
-            return
-
-        if cmd == "slowoff":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            await self.queue_message(channel_id, "/slowoff")
-            return
-
-        if cmd == "emoteonly":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            await self.queue_message(channel_id, "/emoteonly")
-            return
-
-        if cmd == "emoteoff":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            await self.queue_message(channel_id, "/emoteonlyoff")
-            return
-
-        if cmd == "clear":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            await self.queue_message(channel_id, "/clear")
-            return
-
-        if cmd == "shoutout":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if not args:
-                await self.queue_message(channel_id, "Usage: !shoutout <user> (mods+)")
-                return
-            target = args[0].lstrip("@")
-            await self.queue_message(channel_id, f"/shoutout {target}")
+        spec = BUILTINS.get(cmd)
+        if spec is None:
+            await self._run_custom_command(message, channel_id, cmd)
             return
-
-        if cmd == "permit":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if not args:
-                await self.queue_message(channel_id, "Usage: !permit <user> (mods+)")
-                return
-            target = args[0].lstrip("@")
-            moderation_service.permit_user(channel_id, target.lower())
-            await self.queue_message(channel_id, f"{target} can post a link for 60s.")
-            return
-
-        if cmd == "poll":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if len(args) < 3:
-                await self.queue_message(channel_id, "Usage: !poll <duration_sec> <question> | <option1> | <option2> (...) (mods+)")
-                return
-            try:
-                duration = int(args[0])
-            except ValueError:
-                await self.queue_message(channel_id, "Poll duration must be a number of seconds.")
-                return
-            rest = " ".join(args[1:])
-            parts = [p.strip() for p in rest.split("|") if p.strip()]
-            if len(parts) < 3:
-                await self.queue_message(channel_id, "Usage: !poll <duration_sec> <question> | <option1> | <option2> (...) (mods+)")
-                return
-            question = parts[0]
-            options = parts[1:]
-            ok = await twitch_api_service.start_poll(question, options, duration)
-            await self.queue_message(channel_id, "Poll started." if ok else "Failed to start poll (check token/scopes).")
+        required = spec.args_permission if args and spec.args_permission else spec.permission
+        if required != "everyone" and not await permissions_service.has_permission(message, required):
             return
-
-        if cmd == "prediction":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if len(args) < 3:
-                await self.queue_message(channel_id, "Usage: !prediction <duration_sec> <title> | <outcome1> | <outcome2> (mods+)")
-                return
-            try:
-                duration = int(args[0])
-            except ValueError:
-                await self.queue_message(channel_id, "Prediction duration must be a number of seconds.")
-                return
-            rest = " ".join(args[1:])
-            parts = [p.strip() for p in rest.split("|") if p.strip()]
-            if len(parts) < 3:
-                await self.queue_message(channel_id, "Usage: !prediction <duration_sec> <title> | <outcome1> | <outcome2> (mods+)")
-                return
-            title = parts[0]
-            outcomes = parts[1:3]
-            ok = await twitch_api_service.start_prediction(title, outcomes, duration)
-            await self.queue_message(channel_id, "Prediction started." if ok else "Failed to start prediction (check token/scopes).")
-            return
-
-        if cmd == "accountage":
-            target = args[0].lstrip("@") if args else (message.author.name if message.author else None)
-            if not target:
-                await self.queue_message(channel_id, "Usage: !accountage [user]")
-                return
-            age = await twitch_api_service.get_account_age(target)
-            if age:
-                await self.queue_message(channel_id, f"{target} account created {age}.")
-            else:
-                await self.queue_message(channel_id, "Could not fetch account age.")
+        if len(args) < spec.min_args:
+            await self.queue_message(channel_id, spec.usage)
             return
+        started = time.perf_counter()
+        try:
+            await spec.handler(self, message, channel_id, args)
+        finally:
+            metrics_service.observe(f"builtin:{spec.name}", time.perf_counter() - started)
 
-        if cmd == "followage":
-            follower = message.author.name if message.author else None
-            target = channel_id
-            if len(args) == 1:
-                follower = args[0].lstrip("@")
-            elif len(args) >= 2:
-                follower = args[0].lstrip("@")
-                target = args[1].lstrip("@").lower()
-            if not follower:
-                await self.queue_message(channel_id, "Usage: !followage [follower] [target_channel]")
-                return
-            duration = await twitch_api_service.get_follow_duration(follower.lower(), target.lower())
-            if duration:
-                await self.queue_message(channel_id, f"{follower} has been following {target} for {duration}.")
-            else:
-                await self.queue_message(channel_id, f"{follower} is not following {target}.")
+    async def _run_custom_command(self, message, channel_id: str, cmd: str) -> None:
+        command = await commands_service.get_command(channel_id, cmd)
+        if not command:
             return
-
-        if cmd == "8ball":
-            question = " ".join(args)
-            if not question:
-                await self.queue_message(channel_id, "Usage: !8ball <question>")
-                return
-            answers = [
-                "It is certain.",
-                "Without a doubt.",
-                "Yes - definitely.",
-                "Most likely.",
-                "Outlook good.",
-                "Ask again later.",
-                "Better not tell you now.",
-                "Cannot predict now.",
-                "Concentrate and ask again.",
-                "My reply is no.",
-                "Outlook not so good.",
-                "Very doubtful.",
-            ]
-            await self.queue_message(channel_id, random.choice(answers))
+        started = time.perf_counter()
+        try:
+            response = await commands_service.execute_command(command, message)
+        finally:
+            metrics_service.observe("custom_command", time.perf_counter() - started)
+        if response:
+            await self.queue_message(channel_id, response)
+
+    @builtin("commands")
+    async def _cmd_commands(self, message, channel_id: str, args: List[str]) -> None:
+        names = await commands_service.list_allowed_command_names(channel_id, message)
+        snippet = ", ".join(names[:25])
+        if len(names) > 25:
+            snippet += f" (+{len(names)-25} more)"
+        await self.queue_message(channel_id, f"Commands: {snippet}")
+
+    @builtin("help")
+    async def _cmd_help(self, message, channel_id: str, args: List[str]) -> None:
+        # Built-in help, filtered by permission
+        scope = args[0].lower() if args else "default"
+        help_items = []
+        for entry in BUILTIN_HELP:
+            if scope == "mod" and entry["perm"] != "moderator":
+                continue
+            if scope == "all":
+                pass
+            elif not await permissions_service.has_permission(message, entry["perm"]):
+                continue
+            help_items.append(entry["label"])
+        names = await commands_service.list_allowed_command_names(channel_id, message)
+        if names:
+            help_items.append(f"Custom: {', '.join(names[:15])}" + ("" if len(names) <= 15 else " ..."))
+        await self.queue_message(channel_id, " | ".join(help_items))
+
+    @builtin("uptime")
+    async def _cmd_uptime(self, message, channel_id: str, args: List[str]) -> None:
+        uptime = await twitch_api_service.get_stream_uptime(channel_id)
+        await self.queue_message(channel_id, uptime)
+
+    @builtin("game", args_permission="moderator")
+    async def _cmd_game(self, message, channel_id: str, args: List[str]) -> None:
+        if args:
+            new_game = " ".join(args)
+            ok = await twitch_api_service.set_channel_game(channel_id, new_game)
+            await self.queue_message(channel_id, "Game updated" if ok else "Failed to set game")
+        else:
+            info = await twitch_api_service.get_channel_info(channel_id)
+            await self.queue_message(channel_id, info["game_name"] if info else "offline")
+
+    @builtin("title", args_permission="moderator")
+    async def _cmd_title(self, message, channel_id: str, args: List[str]) -> None:
+        if args:
+            new_title = " ".join(args)
+            ok = await twitch_api_service.set_channel_title(channel_id, new_title)
+            await self.queue_message(channel_id, "Title updated" if ok else "Failed to set title")
+        else:
+            info = await twitch_api_service.get_channel_info(channel_id)
+            await self.queue_message(channel_id, info["title"] if info else "offline")
+
+    @builtin("accountage")
+    async def _cmd_accountage(self, message, channel_id: str, args: List[str]) -> None:
+        target = args[0].lstrip("@") if args else (message.author.name if message.author else None)
+        if not target:
+            await self.queue_message(channel_id, "Usage: !accountage [user]")
             return
-
-        if cmd == "regular":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if not args:
-                await self.queue_message(channel_id, "Usage: !regular add/remove <user> or !regular list (mods+)")
-                return
-            action = args[0]
-            if action == "add" and len(args) >= 2:
-                await self._add_regular(channel_id, args[1])
-                await self.queue_message(channel_id, f"{args[1]} added as regular.")
-            elif action == "remove" and len(args) >= 2:
-                await self._remove_regular(channel_id, args[1])
-                await self.queue_message(channel_id, f"{args[1]} removed from regulars.")
-            elif action == "list":
-                regs = await self._list_regulars(channel_id)
-                await self.queue_message(channel_id, f"Regulars: {', '.join(regs) or 'none'}")
-            else:
-                await self.queue_message(channel_id, "Usage: !regular add/remove <user> or !regular list (mods+)")
+        age = await twitch_api_service.get_account_age(target)
+        if age:
+            await self.queue_message(channel_id, f"{target} account created {age}.")
+        else:
+            await self.queue_message(channel_id, "Could not fetch account age.")
+
+    @builtin("followage")
+    async def _cmd_followage(self, message, channel_id: str, args: List[str]) -> None:
+        follower = message.author.name if message.author else None
+        target = channel_id
+        if len(args) == 1:
+            follower = args[0].lstrip("@")
+        elif len(args) >= 2:
+            follower = args[0].lstrip("@")
+            target = args[1].lstrip("@").lower()
+        if not follower:
+            await self.queue_message(channel_id, "Usage: !followage [follower] [target_channel]")
             return
-
-        if cmd == "command":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if not args:
-                await self.queue_message(
-                    channel_id,
-                    "Usage: !command add <name> <response> | edit <name> <response> | del <name> (mods+)",
-                )
-                return
-            sub = args[0]
-            if sub == "add" and len(args) >= 3:
-                name = args[1]
-                response = " ".join(args[2:])
-                await commands_service.add_or_update_command(channel_id, name, response)
-                await self.queue_message(channel_id, f"Command !{name} added.")
-            elif sub == "edit" and len(args) >= 3:
-                name = args[1]
-                response = " ".join(args[2:])
-                await commands_service.add_or_update_command(channel_id, name, response)
-                await self.queue_message(channel_id, f"Command !{name} updated.")
-            elif sub == "del" and len(args) >= 2:
-                await commands_service.delete_command(channel_id, args[1])
-                await self.queue_message(channel_id, f"Command !{args[1]} deleted.")
+        duration = await twitch_api_service.get_follow_duration(follower.lower(), target.lower())
+        if duration:
+            await self.queue_message(channel_id, f"{follower} has been following {target} for {duration}.")
+        else:
+            await self.queue_message(channel_id, f"{follower} is not following {target}.")
+
+    @builtin("8ball", min_args=1, usage="Usage: !8ball <question>")
+    async def _cmd_8ball(self, message, channel_id: str, args: List[str]) -> None:
+        answers = [
+            "It is certain.",
+            "Without a doubt.",
+            "Yes - definitely.",
+            "Most likely.",
+            "Outlook good.",
+            "Ask again later.",
+            "Better not tell you now.",
+            "Cannot predict now.",
+            "Concentrate and ask again.",
+            "My reply is no.",
+            "Outlook not so good.",
+            "Very doubtful.",
+        ]
+        await self.queue_message(channel_id, random.choice(answers))
+
+    @builtin("marker", permission="moderator")
+    async def _cmd_marker(self, message, channel_id: str, args: List[str]) -> None:
+        desc = " ".join(args) if args else "Marked by chat"
+        ok = await twitch_api_service.create_stream_marker(desc)
+        await self.queue_message(channel_id, "Marker added." if ok else "Failed to add marker (check token/scopes/live).")
+
+    @builtin(
+        "regular",
+        permission="moderator",
+        min_args=1,
+        usage="Usage: !regular add/remove <user> or !regular list (mods+)",
+    )
+    async def _cmd_regular(self, message, channel_id: str, args: List[str]) -> None:
+        action = args[0]
+        if action == "add" and len(args) >= 2:
+            await self._add_regular(channel_id, args[1])
+            await self.queue_message(channel_id, f"{args[1]} added as regular.", NOTICE)
+        elif action == "remove" and len(args) >= 2:
+            await self._remove_regular(channel_id, args[1])
+            await self.queue_message(channel_id, f"{args[1]} removed from regulars.", NOTICE)
+        elif action == "list":
+            regs = await self._list_regulars(channel_id)
+            await self.queue_message(channel_id, f"Regulars: {', '.join(regs) or 'none'}")
+        else:
+            await self.queue_message(channel_id, BUILTINS["regular"].usage)
+
+    @builtin(
+        "command",
+        permission="moderator",
+        min_args=1,
+        usage="Usage: !command add <name> <response> | edit <name> <response> | del <name> (mods+)",
+    )
+    async def _cmd_command(self, message, channel_id: str, args: List[str]) -> None:
+        sub = args[0]
+        if sub == "add" and len(args) >= 3:
+            name = args[1]
+            response = " ".join(args[2:])
+            await commands_service.add_or_update_command(channel_id, name, response)
+            await self.queue_message(channel_id, f"Command !{name} added.", NOTICE)
+        elif sub == "edit" and len(args) >= 3:
+            name = args[1]
+            response = " ".join(args[2:])
+            await commands_service.add_or_update_command(channel_id, name, response)
+            await self.queue_message(channel_id, f"Command !{name} updated.", NOTICE)
+        elif sub == "del" and len(args) >= 2:
+            await commands_service.delete_command(channel_id, args[1])
+            await self.queue_message(channel_id, f"Command !{args[1]} deleted.", NOTICE)
+        else:
+            await self.queue_message(channel_id, BUILTINS["command"].usage)
+
+    @builtin(
+        "timer",
+        permission="moderator",
+        min_args=1,
+        usage="Usage: !timer add <name> <interval_minutes> <msg1|msg2> | del <name> (mods+)",
+    )
+    async def _cmd_timer(self, message, channel_id: str, args: List[str]) -> None:
+        sub = args[0]
+        if sub in {"add", "edit"} and len(args) >= 4:
+            name = args[1]
+            interval = int(args[2])
+            messages = " ".join(args[3:]).split("|")
+            await self._upsert_timer(channel_id, name, interval, messages)
+            await self.queue_message(channel_id, f"Timer {name} saved.", NOTICE)
+        elif sub == "del" and len(args) >= 2:
+            await self._delete_timer(channel_id, args[1])
+            await self.queue_message(channel_id, f"Timer {args[1]} deleted.", NOTICE)
+        else:
+            await self.queue_message(channel_id, BUILTINS["timer"].usage)
+
+    @builtin(
+        "giveaway",
+        permission="moderator",
+        min_args=1,
+        usage="Usage: !giveaway start <keyword> | pick | end (mods/broadcaster)",
+    )
+    async def _cmd_giveaway(self, message, channel_id: str, args: List[str]) -> None:
+        action = args[0]
+        if action == "start" and len(args) >= 2:
+            keyword = args[1]
+            await giveaways_service.start_giveaway(channel_id, keyword)
+            await self.queue_message(channel_id, f"Giveaway started with keyword '{keyword}'.")
+        elif action == "end":
+            await giveaways_service.end_giveaway(channel_id)
+            await self.queue_message(channel_id, "Giveaway ended.")
+        elif action == "pick":
+            winner = await giveaways_service.pick_winner(channel_id)
+            if winner:
+                await self.queue_message(channel_id, f"Winner: {winner[1]}!")
             else:
-                await self.queue_message(
-                    channel_id,
-                    "Usage: !command add <name> <response> | edit <name> <response> | del <name> (mods+)",
-                )
+                await self.queue_message(channel_id, "No entries to pick from.")
+        else:
+            await self.queue_message(channel_id, BUILTINS["giveaway"].usage)
+
+    @builtin(
+        "counter",
+        permission="moderator",
+        min_args=1,
+        usage="Usage: !counter set <key> <value> | inc <key> | dec <key> (mods+)",
+    )
+    async def _cmd_counter(self, message, channel_id: str, args: List[str]) -> None:
+        action = args[0]
+        if action == "set" and len(args) == 3:
+            key, value = args[1], int(args[2])
+            await counters_service.set_counter(channel_id, key, value)
+            await self.queue_message(channel_id, f"{key} set to {value}", NOTICE)
+        elif action == "inc" and len(args) >= 2:
+            key = args[1]
+            value = await counters_service.increment_counter(channel_id, key, 1)
+            await self.queue_message(channel_id, f"{key} is now {value}", NOTICE)
+        elif action == "dec" and len(args) >= 2:
+            key = args[1]
+            value = await counters_service.increment_counter(channel_id, key, -1)
+            await self.queue_message(channel_id, f"{key} is now {value}", NOTICE)
+        else:
+            await self.queue_message(channel_id, BUILTINS["counter"].usage)
+
+    @builtin(
+        "slow",
+        permission="moderator",
+        min_args=1,
+        usage="Usage: !slow <seconds> (mods+)",
+        help_label="!slow / !slowoff",
+    )
+    async def _cmd_slow(self, message, channel_id: str, args: List[str]) -> None:
+        await self.queue_message(channel_id, f"/slow {args[0]}", MODERATION)
+
+    @builtin("slowoff", permission="moderator", help_label="")
+    async def _cmd_slowoff(self, message, channel_id: str, args: List[str]) -> None:
+        await self.queue_message(channel_id, "/slowoff", MODERATION)
+
+    @builtin("emoteonly", permission="moderator", help_label="!emoteonly / !emoteoff")
+    async def _cmd_emoteonly(self, message, channel_id: str, args: List[str]) -> None:
+        await self.queue_message(channel_id, "/emoteonly", MODERATION)
+
+    @builtin("emoteoff", permission="moderator", help_label="")
+    async def _cmd_emoteoff(self, message, channel_id: str, args: List[str]) -> None:
+        await self.queue_message(channel_id, "/emoteonlyoff", MODERATION)
+
+    @builtin("clear", permission="moderator")
+    async def _cmd_clear(self, message, channel_id: str, args: List[str]) -> None:
+        await self.queue_message(channel_id, "/clear", MODERATION)
+
+    @builtin("shoutout", permission="moderator", min_args=1, usage="Usage: !shoutout <user> (mods+)")
+    async def _cmd_shoutout(self, message, channel_id: str, args: List[str]) -> None:
+        target = args[0].lstrip("@")
+        await self.queue_message(channel_id, f"/shoutout {target}", MODERATION)
+
+    @builtin("permit", permission="moderator", min_args=1, usage="Usage: !permit <user> (mods+)")
+    async def _cmd_permit(self, message, channel_id: str, args: List[str]) -> None:
+        target = args[0].lstrip("@")
+        moderation_service.permit_user(channel_id, target.lower())
+        await self.queue_message(channel_id, f"{target} can post a link for 60s.", NOTICE)
+
+    @builtin(
+        "poll",
+        permission="moderator",
+        min_args=3,
+        usage="Usage: !poll <duration_sec> <question> | <option1> | <option2> (...) (mods+)",
+    )
+    async def _cmd_poll(self, message, channel_id: str, args: List[str]) -> None:
+        try:
+            duration = int(args[0])
+        except ValueError:
+            await self.queue_message(channel_id, "Poll duration must be a number of seconds.")
             return
-
-        if cmd == "timer":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if not args:
-                await self.queue_message(
-                    channel_id, "Usage: !timer add <name> <interval_minutes> <msg1|msg2> | del <name> (mods+)"
-                )
-                return
-            sub = args[0]
-            if sub in {"add", "edit"} and len(args) >= 4:
-                name = args[1]
-                interval = int(args[2])
-                messages = " ".join(args[3:]).split("|")
-                await self._upsert_timer(channel_id, name, interval, messages)
-                await self.queue_message(channel_id, f"Timer {name} saved.")
-            elif sub == "del" and len(args) >= 2:
-                await self._delete_timer(channel_id, args[1])
-                await self.queue_message(channel_id, f"Timer {args[1]} deleted.")
-            else:
-                await self.queue_message(
-                    channel_id, "Usage: !timer add <name> <interval_minutes> <msg1|msg2> | del <name> (mods+)"
-                )
+        rest = " ".join(args[1:])
+        parts = [p.strip() for p in rest.split("|") if p.strip()]
+        if len(parts) < 3:
+            await self.queue_message(channel_id, BUILTINS["poll"].usage)
             return
-
-        if cmd == "giveaway":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if not args:
-                await self.queue_message(channel_id, "Usage: !giveaway start <keyword> | pick | end (mods/broadcaster)")
-                return
-            action = args[0]
-            if action == "start" and len(args) >= 2:
-                keyword = args[1]
-                await giveaways_service.start_giveaway(channel_id, keyword)
-                await self.queue_message(channel_id, f"Giveaway started with keyword '{keyword}'.")
-            elif action == "end":
-                await giveaways_service.end_giveaway(channel_id)
-                await self.queue_message(channel_id, "Giveaway ended.")
-            elif action == "pick":
-                winner = await giveaways_service.pick_winner(channel_id)
-                if winner:
-                    await self.queue_message(channel_id, f"Winner: {winner[1]}!")
-                else:
-                    await self.queue_message(channel_id, "No entries to pick from.")
-            else:
-                await self.queue_message(
-                    channel_id, "Usage: !giveaway start <keyword> | pick | end (mods/broadcaster)"
-                )
+        question = parts[0]
+        options = parts[1:]
+        ok = await twitch_api_service.start_poll(question, options, duration)
+        await self.queue_message(channel_id, "Poll started." if ok else "Failed to start poll (check token/scopes).")
+
+    @builtin(
+        "prediction",
+        permission="moderator",
+        min_args=3,
+        usage="Usage: !prediction <duration_sec> <title> | <outcome1> | <outcome2> (mods+)",
+    )
+    async def _cmd_prediction(self, message, channel_id: str, args: List[str]) -> None:
+        try:
+            duration = int(args[0])
+        except ValueError:
+            await self.queue_message(channel_id, "Prediction duration must be a number of seconds.")
             return
-
-        if cmd == "counter":
-            if not await permissions_service.has_permission(message, "moderator"):
-                return
-            if not args:
-                await self.queue_message(channel_id, "Usage: !counter set <key> <value> | inc <key> | dec <key> (mods+)")
-                return
-            action = args[0]
-            if action == "set" and len(args) == 3:
-                key, value = args[1], int(args[2])
-                await counters_service.set_counter(channel_id, key, value)
-                await self.queue_message(channel_id, f"{key} set to {value}")
-            elif action == "inc" and len(args) >= 2:
-                key = args[1]
-                value = await counters_service.increment_counter(channel_id, key, 1)
-                await self.queue_message(channel_id, f"{key} is now {value}")
-            elif action == "dec" and len(args) >= 2:
-                key = args[1]
-                value = await counters_service.increment_counter(channel_id, key, -1)
-                await self.queue_message(channel_id, f"{key} is now {value}")
-            else:
-                await self.queue_message(
-                    channel_id, "Usage: !counter set <key> <value> | inc <key> | dec <key> (mods+)"
-                )
+        rest = " ".join(args[1:])
+        parts = [p.strip() for p in rest.split("|") if p.strip()]
+        if len(parts) < 3:
+            await self.queue_message(channel_id, BUILTINS["prediction"].usage)
             return
-
-        # Custom command
-        command = await commands_service.get_command(channel_id, cmd)
-        if command:
-            response = await commands_service.execute_command(command, message)
-            if response:
-                await self.queue_message(channel_id, response)
+        title = parts[0]
+        outcomes = parts[1:3]
+        ok = await twitch_api_service.start_prediction(title, outcomes, duration)
+        await self.queue_message(
+            channel_id, "Prediction started." if ok else "Failed to start prediction (check token/scopes)."
+        )
 
     async def _add_regular(self, channel_id: str, user_name: str) -> None:
-        db = await database.get_db()
-        await db.execute(
-            """
-            INSERT INTO regulars(channel_id, user_id, user_name, added_at)
-            VALUES(?,?,?,?)
-            ON CONFLICT(channel_id, user_id) DO UPDATE SET user_name=excluded.user_name
-            """,
-            (channel_id, user_name.lower(), user_name, int(time.time())),
-        )
-        await db.commit()
+        await permissions_service.add_regular(channel_id, user_name)
 
     async def _remove_regular(self, channel_id: str, user_name: str) -> None:
-        db = await database.get_db()
-        await db.execute("DELETE FROM regulars WHERE channel_id=? AND user_id=?", (channel_id, user_name.lower()))
-        await db.commit()
+        await permissions_service.remove_regular(channel_id, user_name)
 
     async def _list_regulars(self, channel_id: str):
-        db = await database.get_db()
-        async with db.execute("SELECT user_name FROM regulars WHERE channel_id=?", (channel_id,)) as cursor:
-            rows = await cursor.fetchall()
-            return [row["user_name"] for row in rows]
+        return await permissions_service.list_regulars(channel_id)
 
     async def _upsert_timer(self, channel_id: str, name: str, interval: int, messages):
-        db = await database.get_db()
-        await db.execute(
-            """
-            INSERT INTO timers(channel_id, name, messages_json, interval_minutes, require_chat_activity, enabled)
-            VALUES(?,?,?,?,0,1)
-            ON CONFLICT(channel_id, name) DO UPDATE SET messages_json=excluded.messages_json,
-            interval_minutes=excluded.interval_minutes
-            """,
-            (channel_id, name, json.dumps(messages), interval),
-        )
-        await db.commit()
+        channel_id = channel_id.lower()
+        async with database.transaction() as db:
+            await db.execute(
+                """
+                INSERT INTO timers(channel_id, name, messages_json, interval_minutes, require_chat_activity, enabled)
+                VALUES(?,?,?,?,0,1)
+                ON CONFLICT(channel_id, name) DO UPDATE SET messages_json=excluded.messages_json,
+                interval_minutes=excluded.interval_minutes
+                """,
+                (channel_id, name, json.dumps(messages), interval),
+            )
+        await timers_service.timers_service.reload(channel_id)
 
     async def _delete_timer(self, channel_id: str, name: str):
-        db = await database.get_db()
-        await db.execute("DELETE FROM timers WHERE channel_id=? AND name=?", (channel_id, name))
-        await db.commit()
+        channel_id = channel_id.lower()
+        async with database.transaction() as db:
+            await db.execute("DELETE FROM timers WHERE channel_id=? AND name=?", (channel_id, name))
+        await timers_service.timers_service.reload(channel_id)
+
+
+BUILTIN_HELP = [
+    {"label": spec.help_label, "perm": spec.permission} for spec in _builtin_order if spec.help_label
+]
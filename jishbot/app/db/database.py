@@ -1,24 +1,110 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, List
+
 import aiosqlite
 
 from jishbot.app.settings import settings
 from jishbot.app.db import migrations
 
 _db: aiosqlite.Connection | None = None
+_readers: "asyncio.Queue[aiosqlite.Connection] | None" = None
+_reader_conns: List[aiosqlite.Connection] = []
+_readers_lock = asyncio.Lock()
+_write_lock = asyncio.Lock()
+
+
+def _is_memory(path: str) -> bool:
+    return path == ":memory:" or path.startswith("file::memory:")
+
+
+async def _tune(db: aiosqlite.Connection) -> None:
+    await db.execute(f"PRAGMA cache_size = -{int(settings.sqlite_cache_kib)};")
+    await db.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)};")
+    await db.execute("PRAGMA temp_store = MEMORY;")
 
 
 async def get_db() -> aiosqlite.Connection:
-    """Singleton-ish connection; caller should not close."""
+    """The single writer connection; caller should not close.
+
+    Don't run statements on it directly: go through transaction() so one coroutine's writes can't
+    be committed or rolled back by another's. Reads belong on get_read_db().
+    """
     global _db
     if _db is None:
         _db = await aiosqlite.connect(settings.sqlite_path)
         _db.row_factory = aiosqlite.Row
         await _db.execute("PRAGMA foreign_keys = ON;")
+        if not _is_memory(settings.sqlite_path):
+            # WAL lets the read-only connections run while the writer commits
+            await _db.execute("PRAGMA journal_mode = WAL;")
+            await _db.execute("PRAGMA synchronous = NORMAL;")
+        await _tune(_db)
         await migrations.ensure_schema(_db)
     return _db
 
 
+async def _open_readers() -> "asyncio.Queue[aiosqlite.Connection]":
+    global _readers
+    async with _readers_lock:
+        if _readers is None:
+            await get_db()  # schema first
+            queue: "asyncio.Queue[aiosqlite.Connection]" = asyncio.Queue()
+            for _ in range(max(1, settings.sqlite_readers)):
+                uri = Path(settings.sqlite_path).resolve().as_uri() + "?mode=ro"
+                conn = await aiosqlite.connect(uri, uri=True)
+                conn.row_factory = aiosqlite.Row
+                await conn.execute("PRAGMA query_only = ON;")
+                await _tune(conn)
+                _reader_conns.append(conn)
+                queue.put_nowait(conn)
+            _readers = queue
+    return _readers
+
+
+@asynccontextmanager
+async def get_read_db() -> AsyncIterator[aiosqlite.Connection]:
+    """Borrow a read-only connection for SELECTs that don't need to see uncommitted writes.
+
+    Each reader has its own worker thread, so slow dashboard queries don't queue behind the bot.
+    An in-memory database can't be shared across connections, so there the writer is used.
+    """
+    if _is_memory(settings.sqlite_path) or settings.sqlite_readers <= 0:
+        yield await get_db()
+        return
+    readers = _readers or await _open_readers()
+    conn = await readers.get()
+    try:
+        yield conn
+    finally:
+        readers.put_nowait(conn)
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[aiosqlite.Connection]:
+    """Every write: BEGIN IMMEDIATE ... COMMIT on the writer, rolling back on error.
+
+    Holds the write lock for the whole block, so nothing else touches the writer in between.
+    Not re-entrant; don't await another transaction() inside one.
+    """
+    db = await get_db()
+    async with _write_lock:
+        await db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            await db.rollback()
+            raise
+        await db.commit()
+
+
 async def close_db() -> None:
-    global _db
+    global _db, _readers
+    for conn in _reader_conns:
+        await conn.close()
+    _reader_conns.clear()
+    _readers = None
     if _db is not None:
         await _db.close()
         _db = None
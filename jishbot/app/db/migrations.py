@@ -1,9 +1,12 @@
+import json
+import logging
 import time
 
 import aiosqlite
 
+log = logging.getLogger(__name__)
 
-SCHEMA_VERSION = 2
+SCHEMA_VERSION = 8
 
 
 async def ensure_schema(db: aiosqlite.Connection) -> None:
@@ -25,6 +28,24 @@ async def ensure_schema(db: aiosqlite.Connection) -> None:
     if current_version < 2:
         await apply_v2(db)
         current_version = 2
+    if current_version < 3:
+        await apply_v3(db)
+        current_version = 3
+    if current_version < 4:
+        await apply_v4(db)
+        current_version = 4
+    if current_version < 5:
+        await apply_v5(db)
+        current_version = 5
+    if current_version < 6:
+        await apply_v6(db)
+        current_version = 6
+    if current_version < 7:
+        await apply_v7(db)
+        current_version = 7
+    if current_version < 8:
+        await apply_v8(db)
+        current_version = 8
     if row is None or row["version"] != current_version:
         await db.execute("DELETE FROM schema_version")
         await db.execute(
@@ -135,3 +156,184 @@ async def apply_v2(db: aiosqlite.Connection) -> None:
         """
     )
     await db.commit()
+
+
+async def apply_v3(db: aiosqlite.Connection) -> None:
+    await db.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS giveaway_entries(
+            channel_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            user_name TEXT NOT NULL,
+            entered_at INTEGER NOT NULL,
+            PRIMARY KEY(channel_id, user_id)
+        );
+        """
+    )
+    # Move entries out of the giveaways.entries_json blob into rows
+    async with db.execute("SELECT channel_id, entries_json, started_at FROM giveaways") as cursor:
+        rows = await cursor.fetchall()
+    entries = []
+    for row in rows:
+        for entry in json.loads(row["entries_json"] or "[]"):
+            entries.append((row["channel_id"], entry["user_id"], entry["user_name"], row["started_at"] or 0))
+    if entries:
+        await db.executemany(
+            "INSERT OR IGNORE INTO giveaway_entries(channel_id, user_id, user_name, entered_at) VALUES(?,?,?,?)",
+            entries,
+        )
+    await db.execute("UPDATE giveaways SET entries_json='[]'")
+    await db.commit()
+
+
+async def apply_v4(db: aiosqlite.Connection) -> None:
+    await db.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS twitch_users(
+            login TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            data_json TEXT NOT NULL,
+            fetched_at INTEGER NOT NULL,
+            last_used_at INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_twitch_users_last_used ON twitch_users(last_used_at);
+        """
+    )
+    await db.commit()
+
+
+# For the channel-id case fold: the columns that, with channel_id, identify a row, and the
+# ordering (most preferred first) that picks which of several case variants survives.
+# Ties go to the row that was already lowercase, then the newest row.
+CHANNEL_TABLES = {
+    "commands": (("name",), ("updated_at",)),
+    "timers": (("name",), ("id",)),
+    "filters": None,  # no natural key, nothing can collide
+    "link_settings": ((), ()),
+    "regulars": (("user_id",), ("added_at",)),
+    "giveaways": ((), ("is_active", "started_at")),
+    "giveaway_entries": (("user_id",), ()),
+    "counters": (("key",), ()),  # values are summed instead of picking one
+    "infractions": None,
+    "notifications": ((), ("webhook_url IS NOT NULL AND webhook_url != ''", "last_notified_at")),
+}
+
+
+async def _merge_case_variants(db: aiosqlite.Connection, table: str, keys: tuple, order: tuple) -> None:
+    key_sql = "".join(f", {k}" for k in keys)
+    order_sql = "".join(f"{expr} DESC, " for expr in order)
+    async with db.execute(
+        f"""
+        SELECT rowid AS rid, lower(channel_id) AS folded, * FROM {table}
+        WHERE lower(channel_id) IN (SELECT lower(channel_id) FROM {table} WHERE channel_id != lower(channel_id))
+        ORDER BY folded{key_sql}, {order_sql}channel_id = lower(channel_id) DESC, rowid DESC
+        """
+    ) as cursor:
+        rows = await cursor.fetchall()
+    groups: dict = {}
+    for row in rows:
+        groups.setdefault((row["folded"], *(row[k] for k in keys)), []).append(row)
+    for group_key, group in groups.items():
+        if len(group) < 2:
+            continue
+        winner, losers = group[0], group[1:]
+        if table == "counters":
+            total = sum(row["value"] for row in group)
+            await db.execute(f"UPDATE {table} SET value=? WHERE rowid=?", (total, winner["rid"]))
+            log.warning("Merged %d case variants of counter %s into %d", len(group), group_key, total)
+        else:
+            for row in losers:
+                log.warning(
+                    "Dropping %s row %s, superseded by %r: %r",
+                    table,
+                    group_key,
+                    winner["channel_id"],
+                    {k: row[k] for k in row.keys() if k not in ("rid", "folded")},
+                )
+        await db.executemany(f"DELETE FROM {table} WHERE rowid=?", [(row["rid"],) for row in losers])
+
+
+async def apply_v5(db: aiosqlite.Connection) -> None:
+    # Channel ids are lowercase logins everywhere; fold any stragglers so plain channel_id=? lookups hit.
+    for table, merge in CHANNEL_TABLES.items():
+        if merge is not None:
+            await _merge_case_variants(db, table, *merge)
+        await db.execute(f"UPDATE {table} SET channel_id=lower(channel_id) WHERE channel_id != lower(channel_id)")
+    await db.executescript(
+        """
+        CREATE INDEX IF NOT EXISTS idx_filters_channel ON filters(channel_id, enabled);
+        CREATE INDEX IF NOT EXISTS idx_infractions_channel_user ON infractions(channel_id, user_id, created_at);
+        CREATE INDEX IF NOT EXISTS idx_channels_enabled ON channels(channel_name) WHERE is_enabled=1;
+        CREATE INDEX IF NOT EXISTS idx_giveaways_active ON giveaways(channel_id) WHERE is_active=1;
+        CREATE INDEX IF NOT EXISTS idx_notifications_webhook ON notifications(channel_id)
+            WHERE webhook_url IS NOT NULL AND webhook_url != '';
+        CREATE INDEX IF NOT EXISTS idx_twitch_users_fetched ON twitch_users(fetched_at);
+        """
+    )
+    await db.commit()
+
+
+async def apply_v6(db: aiosqlite.Connection) -> None:
+    await db.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS infraction_rollups(
+            channel_id TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(channel_id, hour, reason)
+        ) WITHOUT ROWID;
+
+        INSERT OR IGNORE INTO infraction_rollups(channel_id, hour, reason, count)
+        SELECT channel_id, created_at - created_at % 3600, reason, COUNT(*)
+        FROM infractions
+        GROUP BY channel_id, created_at - created_at % 3600, reason;
+        """
+    )
+    await db.commit()
+
+
+# Tables the dashboard renders, and the columns whose updates count as a config change
+# (None = any column). Poll status, giveaway entries and infractions change too often to version;
+# the dashboard render cache checks the entry count and the 24h infraction total itself.
+CONFIG_TABLES = {
+    "commands": None,
+    "timers": None,
+    "filters": None,
+    "link_settings": None,
+    "giveaways": "is_active, keyword",
+    "notifications": "webhook_url",
+}
+
+
+async def apply_v7(db: aiosqlite.Connection) -> None:
+    await db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS channel_config(
+            channel_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    # Triggers, so every writer (bot commands, dashboard forms, the JSON API) bumps the version
+    for table, columns in CONFIG_TABLES.items():
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            if event == "UPDATE" and columns:
+                event = f"UPDATE OF {columns}"
+            name = f"trg_{table}_{event.split()[0].lower()}_config"
+            await db.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO channel_config(channel_id, version) VALUES({row}.channel_id, 1)
+                    ON CONFLICT(channel_id) DO UPDATE SET version=version+1;
+                END
+                """
+            )
+    await db.commit()
+
+
+async def apply_v8(db: aiosqlite.Connection) -> None:
+    # Lets the retention job find expired infractions without walking the table
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_infractions_created ON infractions(created_at)")
+    await db.commit()
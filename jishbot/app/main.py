@@ -5,7 +5,14 @@ import uvicorn
 
 from jishbot.app.bot import JishBot
 from jishbot.app.db import database
-from jishbot.app.services import notifications_service
+from jishbot.app.services import (
+    counters_service,
+    giveaways_service,
+    http_service,
+    infractions_service,
+    notifications_service,
+    permissions_service,
+)
 from jishbot.app.settings import settings
 from jishbot.app.web.webapp import app as fastapi_app
 from jishbot.app.services import twitch_api_service
@@ -19,12 +26,15 @@ async def start_web():
 
 async def main():
     logging.basicConfig(level=getattr(logging, settings.log_level.upper(), logging.INFO))
-    db = await database.get_db()  # ensures migrations run
+    await database.get_db()  # ensures migrations run
+    http_service.start()
+    await twitch_api_service.load_user_cache()
     channels = settings.twitch_channels
     if not channels:
-        async with db.execute("SELECT channel_name FROM channels WHERE is_enabled=1") as cursor:
-            rows = await cursor.fetchall()
-            channels = [row["channel_name"].lstrip("#").lower() for row in rows]
+        async with database.get_read_db() as db:
+            async with db.execute("SELECT channel_name FROM channels WHERE is_enabled=1") as cursor:
+                rows = await cursor.fetchall()
+                channels = [row["channel_name"].lstrip("#").lower() for row in rows]
     if not channels:
         raise RuntimeError("No channels configured; set TWITCH_CHANNELS or insert into channels table.")
     bot_id = settings.twitch_bot_id
@@ -34,8 +44,26 @@ async def main():
             raise RuntimeError("Unable to resolve bot user id; set TWITCH_BOT_ID to numeric user id.")
         bot_id = user["id"]
     owner_id = settings.twitch_owner_id or bot_id
+    await permissions_service.load_regulars()
+    await giveaways_service.load_active()
     bot = JishBot(channels, bot_id=bot_id, owner_id=owner_id)
-    await asyncio.gather(bot.start(), start_web(), notifications_service.run_poll_loop(channels))
+    infractions_service.journal.start()
+    try:
+        tasks = [
+            bot.start(),
+            start_web(),
+            notifications_service.run_poll_loop(channels),
+            infractions_service.run_retention_loop(),
+        ]
+        if settings.eventsub_enabled:
+            tasks.append(notifications_service.run_eventsub(channels))
+        await asyncio.gather(*tasks)
+    finally:
+        await infractions_service.journal.close()
+        await counters_service.hot_counters.close()
+        await http_service.close()
+        await twitch_api_service.save_user_cache()
+        await database.close_db()
 
 
 if __name__ == "__main__":
@@ -1,47 +1,161 @@
+import asyncio
 import re
 import time
-from typing import Any, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from jishbot.app.db import database
 from jishbot.app.services import counters_service, cooldowns_service, permissions_service, twitch_api_service
 
 
+VARIABLE_REGEX = re.compile(r"\$\{(\w+)\}")
+
+
+class ResponseTemplate:
+    """A command response split once into literal text and ${variable} segments."""
+
+    __slots__ = ("segments", "variables")
+
+    def __init__(self, response: str) -> None:
+        # (is_variable, text); variable segments hold the bare name
+        self.segments: List[Tuple[bool, str]] = []
+        pos = 0
+        for match in VARIABLE_REGEX.finditer(response):
+            if match.start() > pos:
+                self.segments.append((False, response[pos : match.start()]))
+            self.segments.append((True, match.group(1)))
+            pos = match.end()
+        if pos < len(response):
+            self.segments.append((False, response[pos:]))
+        self.variables = tuple(dict.fromkeys(text for is_var, text in self.segments if is_var))
+
+    def render(self, values: Dict[str, str]) -> str:
+        out = []
+        for is_var, text in self.segments:
+            if not is_var:
+                out.append(text)
+            elif text in values:
+                out.append(values[text])
+            else:
+                out.append("${" + text + "}")
+        return "".join(out)
+
+
+class RenderContext:
+    def __init__(self, command: dict, msg: Any) -> None:
+        self.command = command
+        self.msg = msg
+        self.channel_login = msg.channel.name
+        self.author = msg.author.name if msg.author else "someone"
+        self._shared: Dict[str, asyncio.Future] = {}
+
+    def shared(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        """Run factory at most once per render; resolvers needing the same lookup share it."""
+        future = self._shared.get(key)
+        if future is None:
+            future = self._shared[key] = asyncio.ensure_future(factory())
+        return future
+
+
+VariableResolver = Callable[[RenderContext], Awaitable[str]]
+_resolvers: Dict[str, VariableResolver] = {}
+
+
+def register_variable(name: str) -> Callable[[VariableResolver], VariableResolver]:
+    def decorator(func: VariableResolver) -> VariableResolver:
+        _resolvers[name] = func
+        return func
+
+    return decorator
+
+
+@register_variable("user")
+async def _resolve_user(ctx: RenderContext) -> str:
+    return ctx.author
+
+
+@register_variable("channel")
+async def _resolve_channel(ctx: RenderContext) -> str:
+    return ctx.channel_login
+
+
+@register_variable("count")
+async def _resolve_count(ctx: RenderContext) -> str:
+    count = await counters_service.increment_counter(
+        ctx.command["channel_id"], f"cmd:{ctx.command['name']}", hot=True
+    )
+    return str(count)
+
+
+@register_variable("uptime")
+async def _resolve_uptime(ctx: RenderContext) -> str:
+    return await twitch_api_service.get_stream_uptime(ctx.channel_login)
+
+
+async def _channel_info(ctx: RenderContext) -> Optional[dict]:
+    return await ctx.shared("channel_info", lambda: twitch_api_service.get_channel_info(ctx.channel_login))
+
+
+@register_variable("game")
+async def _resolve_game(ctx: RenderContext) -> str:
+    info = await _channel_info(ctx)
+    return info["game_name"] if info else "offline"
+
+
+@register_variable("title")
+async def _resolve_title(ctx: RenderContext) -> str:
+    info = await _channel_info(ctx)
+    return info["title"] if info else "offline"
+
+
+def _with_template(row) -> dict:
+    command = dict(row)
+    command["template"] = ResponseTemplate(command["response"])
+    return command
+
+
+# channel -> command name -> enabled command row (plus its parsed template)
+_registry: Dict[str, Dict[str, dict]] = {}
+_lock = asyncio.Lock()
+
+
+async def _channel_commands(channel_id: str) -> Dict[str, dict]:
+    commands = _registry.get(channel_id)
+    if commands is not None:
+        return commands
+    async with _lock:
+        commands = _registry.get(channel_id)
+        if commands is None:
+            async with database.get_read_db() as db:
+                async with db.execute(
+                    "SELECT * FROM commands WHERE channel_id=? AND enabled=1 ORDER BY name", (channel_id,)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            commands = {row["name"]: _with_template(row) for row in rows}
+            _registry[channel_id] = commands
+    return commands
+
+
+async def preload(channel_id: str) -> None:
+    await _channel_commands(channel_id.lower())
+
+
 async def list_command_names(channel_id: str) -> List[str]:
-    channel_id = channel_id.lower()
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT name FROM commands WHERE lower(channel_id)=? AND enabled=1 ORDER BY name", (channel_id,)
-    ) as cursor:
-        rows = await cursor.fetchall()
-        return [row["name"] for row in rows]
+    commands = await _channel_commands(channel_id.lower())
+    return sorted(commands)
 
 
 async def list_allowed_command_names(channel_id: str, msg: Any) -> List[str]:
-    channel_id = channel_id.lower()
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT name, permission FROM commands WHERE lower(channel_id)=? AND enabled=1 ORDER BY name",
-        (channel_id,),
-    ) as cursor:
-        rows = await cursor.fetchall()
+    commands = await _channel_commands(channel_id.lower())
     allowed = []
-    for row in rows:
-        if await permissions_service.has_permission(msg, row["permission"]):
-            allowed.append(row["name"])
+    for name in sorted(commands):
+        if await permissions_service.has_permission(msg, commands[name]["permission"]):
+            allowed.append(name)
     return allowed
 
 
 async def get_command(channel_id: str, name: str) -> Optional[dict]:
-    channel_id = channel_id.lower()
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT * FROM commands WHERE lower(channel_id)=? AND name=? AND enabled=1",
-        (channel_id, name),
-    ) as cursor:
-        row = await cursor.fetchone()
-        if not row:
-            return None
-        return dict(row)
+    commands = await _channel_commands(channel_id.lower())
+    return commands.get(name)
 
 
 async def add_or_update_command(
@@ -53,49 +167,53 @@ async def add_or_update_command(
     cooldown_user: int = 0,
 ) -> None:
     channel_id = channel_id.lower()
-    db = await database.get_db()
     now = int(time.time())
-    await db.execute(
-        """
-        INSERT INTO commands(channel_id, name, response, permission, cooldown_global, cooldown_user, created_at, updated_at)
-        VALUES(?,?,?,?,?,?,?,?)
-        ON CONFLICT(channel_id, name)
-        DO UPDATE SET response=excluded.response, permission=excluded.permission,
-                      cooldown_global=excluded.cooldown_global, cooldown_user=excluded.cooldown_user,
-                      updated_at=excluded.updated_at
-        """,
-        (channel_id, name, response, permission, cooldown_global, cooldown_user, now, now),
-    )
-    await db.commit()
+    async with _lock:
+        async with database.transaction() as db:
+            await db.execute(
+                """
+                INSERT INTO commands(channel_id, name, response, permission, cooldown_global, cooldown_user, created_at, updated_at)
+                VALUES(?,?,?,?,?,?,?,?)
+                ON CONFLICT(channel_id, name)
+                DO UPDATE SET response=excluded.response, permission=excluded.permission,
+                              cooldown_global=excluded.cooldown_global, cooldown_user=excluded.cooldown_user,
+                              updated_at=excluded.updated_at
+                """,
+                (channel_id, name, response, permission, cooldown_global, cooldown_user, now, now),
+            )
+            async with db.execute("SELECT * FROM commands WHERE channel_id=? AND name=?", (channel_id, name)) as cursor:
+                row = await cursor.fetchone()
+        commands = _registry.get(channel_id)
+        if commands is None:
+            return
+        if row and row["enabled"]:
+            commands[name] = _with_template(row)
+        else:
+            commands.pop(name, None)
 
 
 async def delete_command(channel_id: str, name: str) -> None:
-    db = await database.get_db()
-    await db.execute("DELETE FROM commands WHERE channel_id=? AND name=?", (channel_id, name))
-    await db.commit()
+    channel_id = channel_id.lower()
+    async with _lock:
+        async with database.transaction() as db:
+            await db.execute("DELETE FROM commands WHERE channel_id=? AND name=?", (channel_id, name))
+        commands = _registry.get(channel_id)
+        if commands is not None:
+            commands.pop(name, None)
+    cooldowns_service.cooldowns.reset_channel(channel_id, name)
 
 
 async def _replace_variables(command: dict, msg: Any) -> str:
-    content = command["response"]
-    channel_login = msg.channel.name
-    author = msg.author.name if msg.author else "someone"
-    replacements = {
-        "${user}": author,
-        "${channel}": channel_login,
-    }
-    if "${count}" in content:
-        count = await counters_service.increment_counter(command["channel_id"], f"cmd:{command['name']}")
-        replacements["${count}"] = str(count)
-    if "${uptime}" in content:
-        replacements["${uptime}"] = await twitch_api_service.get_stream_uptime(channel_login)
-    if "${game}" in content or "${title}" in content:
-        info = await twitch_api_service.get_channel_info(channel_login)
-        replacements["${game}"] = info["game_name"] if info else "offline"
-        replacements["${title}"] = info["title"] if info else "offline"
-
-    for key, val in replacements.items():
-        content = content.replace(key, val)
-    return content
+    template = command.get("template") or ResponseTemplate(command["response"])
+    names = [name for name in template.variables if name in _resolvers]
+    if not names:
+        return template.render({})
+    ctx = RenderContext(command, msg)
+    if len(names) == 1:
+        results = [await _resolvers[names[0]](ctx)]
+    else:
+        results = await asyncio.gather(*(_resolvers[name](ctx) for name in names))
+    return template.render(dict(zip(names, results)))
 
 
 async def can_run_command(command: dict, msg: Any) -> bool:
@@ -1,14 +1,36 @@
+import heapq
+import itertools
 import time
-from collections import defaultdict
-from typing import Dict, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from jishbot.app.services import metrics_service
+
+# (command, user_id); user_id is None for the command's global cooldown
+CooldownKey = Tuple[str, Optional[str]]
 
 
 class CooldownService:
     def __init__(self) -> None:
-        # (channel, command) -> timestamp
-        self.global_cooldowns: Dict[Tuple[str, str], float] = {}
-        # (channel, command, user) -> timestamp
-        self.user_cooldowns: Dict[Tuple[str, str, str], float] = {}
+        # channel -> (command, user|None) -> timestamp when ready again
+        self._ready_at: Dict[str, Dict[CooldownKey, float]] = {}
+        # (ready_at, seq, channel, key); entries whose ready_at no longer matches are stale
+        self._expiry: List[Tuple[float, int, str, CooldownKey]] = []
+        self._seq = itertools.count()
+
+    def _purge(self, now: float) -> None:
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            ready_at, _, channel_id, key = heapq.heappop(expiry)
+            entries = self._ready_at.get(channel_id)
+            if entries is None or entries.get(key) != ready_at:
+                continue
+            del entries[key]
+            if not entries:
+                del self._ready_at[channel_id]
+
+    def _set(self, channel_id: str, key: CooldownKey, ready_at: float) -> None:
+        self._ready_at.setdefault(channel_id, {})[key] = ready_at
+        heapq.heappush(self._expiry, (ready_at, next(self._seq), channel_id, key))
 
     def check_and_set(
         self,
@@ -20,23 +42,54 @@ class CooldownService:
     ) -> bool:
         """Return True if command is allowed; sets cooldowns when allowed."""
         now = time.time()
-        global_key = (channel_id, command_name)
-        user_key = (channel_id, command_name, user_id)
+        self._purge(now)
+        entries = self._ready_at.get(channel_id, {})
+        global_key: CooldownKey = (command_name, None)
+        user_key: CooldownKey = (command_name, user_id)
 
-        if cooldown_global > 0:
-            next_ready = self.global_cooldowns.get(global_key, 0)
-            if now < next_ready:
-                return False
-        if cooldown_user > 0:
-            next_ready_user = self.user_cooldowns.get(user_key, 0)
-            if now < next_ready_user:
-                return False
+        if cooldown_global > 0 and now < entries.get(global_key, 0):
+            return False
+        if cooldown_user > 0 and now < entries.get(user_key, 0):
+            return False
 
         if cooldown_global > 0:
-            self.global_cooldowns[global_key] = now + cooldown_global
+            self._set(channel_id, global_key, now + cooldown_global)
         if cooldown_user > 0:
-            self.user_cooldowns[user_key] = now + cooldown_user
+            self._set(channel_id, user_key, now + cooldown_user)
         return True
 
+    def reset_channel(self, channel_id: str, command_name: Optional[str] = None) -> int:
+        """Clear cooldowns for a channel (or one of its commands); returns how many were live."""
+        entries = self._ready_at.get(channel_id)
+        if not entries:
+            return 0
+        if command_name is None:
+            del self._ready_at[channel_id]
+            return len(entries)
+        keys = [key for key in entries if key[0] == command_name]
+        for key in keys:
+            del entries[key]
+        if not entries:
+            del self._ready_at[channel_id]
+        return len(keys)
+
+    def stats(self) -> dict:
+        self._purge(time.time())
+        global_entries = 0
+        user_entries = 0
+        for entries in self._ready_at.values():
+            for _, user_id in entries:
+                if user_id is None:
+                    global_entries += 1
+                else:
+                    user_entries += 1
+        return {
+            "channels": len(self._ready_at),
+            "global_entries": global_entries,
+            "user_entries": user_entries,
+            "heap_size": len(self._expiry),
+        }
+
 
 cooldowns = CooldownService()
+metrics_service.register("cooldowns", cooldowns.stats)
@@ -1,33 +1,176 @@
-import aiosqlite
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
 
 from jishbot.app.db import database
+from jishbot.app.services import metrics_service
+from jishbot.app.settings import settings
+
+log = logging.getLogger(__name__)
+
+CounterKey = Tuple[str, str]  # (channel_id, key)
+
+UPSERT_ADD_SQL = """
+    INSERT INTO counters(channel_id, key, value) VALUES(?,?,?)
+    ON CONFLICT(channel_id, key) DO UPDATE SET value=value+excluded.value
+"""
+
+
+class HotCounters:
+    """Applies increments in memory and adds the accumulated deltas to the table in batches.
+
+    Anything not yet flushed (at most flush_ms worth, or max_pending increments) is lost on a crash.
+    """
+
+    def __init__(self, flush_ms: int, max_pending: int) -> None:
+        self.flush_ms = flush_ms
+        self.max_pending = max(1, max_pending)
+        self._values: Dict[CounterKey, int] = {}
+        self._deltas: Dict[CounterKey, int] = {}
+        self._pending_increments = 0
+        self._lock = asyncio.Lock()
+        self._pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_flushed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_ms > 0
+
+    def peek(self, counter: CounterKey) -> Optional[int]:
+        return self._values.get(counter)
+
+    async def increment(self, counter: CounterKey, delta: int) -> int:
+        if counter not in self._values:
+            async with self._lock:
+                if counter not in self._values:
+                    self._values[counter] = await _select_counter(*counter)
+        value = self._values[counter] + delta
+        self._values[counter] = value
+        self._deltas[counter] = self._deltas.get(counter, 0) + delta
+        self._pending_increments += 1
+        self._pending.set()
+        if self._pending_increments >= self.max_pending:
+            self._full.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return value
+
+    async def _run(self) -> None:
+        while True:
+            await self._pending.wait()
+            if not self._full.is_set():
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            self._pending.clear()
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Failed to flush hot counters")
+                await asyncio.sleep(1)
+
+    async def flush(self) -> None:
+        async with self._lock:
+            await self._flush_locked()
+
+    async def _flush_locked(self) -> None:
+        deltas, self._deltas = self._deltas, {}
+        self._pending_increments = 0
+        rows = [(channel_id, key, delta) for (channel_id, key), delta in deltas.items() if delta]
+        if not rows:
+            return
+        try:
+            async with database.transaction() as db:
+                await db.executemany(UPSERT_ADD_SQL, rows)
+        except BaseException:
+            for counter, delta in deltas.items():
+                self._deltas[counter] = self._deltas.get(counter, 0) + delta
+            self._pending.set()
+            raise
+        self.flushes += 1
+        self.rows_flushed += len(rows)
+
+    async def overwrite(self, counter: CounterKey, value: int) -> None:
+        """Write an absolute value, discarding any unflushed delta for this counter."""
+        async with self._lock:
+            self._deltas.pop(counter, None)
+            await _write_counter(*counter, value)
+            if counter in self._values:
+                self._values[counter] = value
+
+    async def close(self) -> None:
+        if self._task is not None:
+            async with self._lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "tracked": len(self._values),
+            "pending_counters": len(self._deltas),
+            "pending_increments": self._pending_increments,
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+        }
+
+
+hot_counters = HotCounters(settings.hot_counter_flush_ms, settings.hot_counter_max_pending)
+metrics_service.register("hot_counters", hot_counters.stats)
+
+
+async def _select_counter(channel_id: str, key: str) -> int:
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT value FROM counters WHERE channel_id=? AND key=?",
+            (channel_id, key),
+        ) as cursor:
+            row = await cursor.fetchone()
+            return int(row["value"]) if row else 0
+
+
+async def _write_counter(channel_id: str, key: str, value: int) -> None:
+    async with database.transaction() as db:
+        await db.execute(
+            """
+            INSERT INTO counters(channel_id, key, value) VALUES(?,?,?)
+            ON CONFLICT(channel_id, key) DO UPDATE SET value=excluded.value
+            """,
+            (channel_id, key, value),
+        )
 
 
 async def get_counter(channel_id: str, key: str) -> int:
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT value FROM counters WHERE channel_id=? AND key=?",
-        (channel_id, key),
-    ) as cursor:
-        row = await cursor.fetchone()
-        return int(row["value"]) if row else 0
+    value = hot_counters.peek((channel_id, key))
+    if value is not None:
+        return value
+    return await _select_counter(channel_id, key)
 
 
 async def set_counter(channel_id: str, key: str, value: int) -> int:
-    db = await database.get_db()
-    await db.execute(
-        """
-        INSERT INTO counters(channel_id, key, value) VALUES(?,?,?)
-        ON CONFLICT(channel_id, key) DO UPDATE SET value=excluded.value
-        """,
-        (channel_id, key, value),
-    )
-    await db.commit()
+    if hot_counters.peek((channel_id, key)) is not None:
+        await hot_counters.overwrite((channel_id, key), value)
+    else:
+        await _write_counter(channel_id, key, value)
     return value
 
 
-async def increment_counter(channel_id: str, key: str, delta: int = 1) -> int:
-    value = await get_counter(channel_id, key)
-    value += delta
-    await set_counter(channel_id, key, value)
-    return value
+async def increment_counter(channel_id: str, key: str, delta: int = 1, hot: bool = False) -> int:
+    """Add delta and return the new value. hot=True batches the write when hot-counter mode is on."""
+    counter = (channel_id, key)
+    if hot_counters.enabled and (hot or hot_counters.peek(counter) is not None):
+        return await hot_counters.increment(counter, delta)
+    async with database.transaction() as db:
+        async with db.execute(UPSERT_ADD_SQL + " RETURNING value", (channel_id, key, delta)) as cursor:
+            row = await cursor.fetchone()
+    return int(row["value"])
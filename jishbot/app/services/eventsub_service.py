@@ -0,0 +1,309 @@
+import asyncio
+import json
+import logging
+import random
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+DEFAULT_URL = "wss://eventsub.wss.twitch.tv/ws"
+WELCOME_TIMEOUT_SECONDS = 10
+KEEPALIVE_GRACE_SECONDS = 5
+RECONNECT_MAX_SECONDS = 60
+SEEN_MESSAGE_IDS = 1000  # Twitch may redeliver a message; remember this many ids
+
+# What a subscribe attempt came to
+SUBSCRIBED = "subscribed"
+OVER_BUDGET = "over_budget"  # the session's max_total_cost is used up; stop subscribing on it
+REJECTED = "rejected"  # won't work on a retry (bad condition, missing authorization)
+FAILED = "failed"  # transient; tried again on the next session
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class Connection(ABC):
+    """One WebSocket connection. receive() returns None once the socket is closed."""
+
+    @abstractmethod
+    async def receive(self) -> Optional[str]: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+
+class Transport(ABC):
+    """Opens connections; swap in another implementation to run against a local stand-in server."""
+
+    @abstractmethod
+    async def connect(self, url: str) -> Connection: ...
+
+
+class _AiohttpConnection(Connection):
+    def __init__(self, ws) -> None:
+        self._ws = ws
+
+    async def receive(self) -> Optional[str]:
+        import aiohttp
+
+        msg = await self._ws.receive()
+        if msg.type == aiohttp.WSMsgType.TEXT:
+            return msg.data
+        if msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED):
+            return None
+        if msg.type == aiohttp.WSMsgType.ERROR:
+            return None
+        return ""  # binary/ping frames carry nothing for us
+
+    async def close(self) -> None:
+        await self._ws.close()
+
+
+class AiohttpTransport(Transport):
+    """Default transport; aiohttp is already installed as a twitchio dependency."""
+
+    def __init__(self) -> None:
+        self._session = None
+
+    async def connect(self, url: str) -> Connection:
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return _AiohttpConnection(await self._session.ws_connect(url))
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+@dataclass(frozen=True)
+class Subscription:
+    type: str
+    version: str
+    condition: Tuple[Tuple[str, str], ...]  # sorted items, so it can be hashed
+
+    @staticmethod
+    def of(type_: str, version: str, **condition: str) -> "Subscription":
+        return Subscription(type_, version, tuple(sorted(condition.items())))
+
+
+@dataclass
+class SubscribeResult:
+    outcome: str
+    total_cost: Optional[int] = None  # from a 202: the session's cost so far and its cap
+    max_total_cost: Optional[int] = None
+
+
+SubscribeFunc = Callable[[Subscription, str], Awaitable[SubscribeResult]]
+
+
+class _SessionLost(Exception):
+    pass
+
+
+class EventSubClient:
+    """EventSub over WebSocket: welcome -> subscribe -> notifications, following session_reconnect.
+
+    Subscriptions survive a session_reconnect. A dropped socket or missed keepalive starts a new
+    session and subscribes again, one at a time and only until the session's cost cap is reached;
+    rejected subscriptions are not retried. Callers should keep a slower poll as a reconciler for
+    whatever isn't active, and for events sent while no session is open, which are not replayed.
+    """
+
+    def __init__(
+        self,
+        subscriptions: List[Subscription],
+        subscribe: SubscribeFunc,
+        transport: Optional[Transport] = None,
+        url: str = DEFAULT_URL,
+    ) -> None:
+        self.subscriptions = subscriptions
+        self.url = url
+        self._subscribe = subscribe
+        self._transport = transport or AiohttpTransport()
+        self._handlers: Dict[str, Handler] = {}
+        self._active: set = set()
+        self._rejected: set = set()
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self.session_id: Optional[str] = None
+        self.sessions = 0
+        self.reconnects = 0
+        self.notifications = 0
+        self.duplicates = 0
+        self.revocations = 0
+        self.over_budget = 0  # subscriptions the current session had no cost left for
+
+    def on(self, subscription_type: str, handler: Handler) -> None:
+        self._handlers[subscription_type] = handler
+
+    def is_active(self, subscription: Subscription) -> bool:
+        return self.session_id is not None and subscription in self._active
+
+    async def run(self) -> None:
+        url = self.url
+        fresh = True
+        old: Optional[Connection] = None
+        old_reader: Optional[asyncio.Task] = None
+        failures = 0
+        while True:
+            if fresh and all(sub in self._rejected for sub in self.subscriptions):
+                log.warning("EventSub: no subscription can be made; leaving these channels to polling")
+                self.session_id = None
+                if isinstance(self._transport, AiohttpTransport):
+                    await self._transport.close()
+                return
+            conn: Optional[Connection] = None
+            try:
+                conn = await self._transport.connect(url)
+                welcome = await self._next_message(conn, WELCOME_TIMEOUT_SECONDS)
+                if welcome["metadata"]["message_type"] != "session_welcome":
+                    raise _SessionLost(f"expected session_welcome, got {welcome['metadata']['message_type']}")
+                session = welcome["payload"]["session"]
+                if old is not None:
+                    # session_reconnect: the new socket is up, so the old one can go
+                    old_reader.cancel()
+                    await old.close()
+                    old = old_reader = None
+                self.session_id = session["id"]
+                if fresh:
+                    self.sessions += 1
+                    self._active.clear()
+                    await self._subscribe_all(session["id"])
+                if not self._active:
+                    # Twitch closes a socket with no subscriptions anyway; back off instead of redialling
+                    raise _SessionLost("no subscription was accepted")
+                failures = 0
+                keepalive = (session.get("keepalive_timeout_seconds") or 10) + KEEPALIVE_GRACE_SECONDS
+                reconnect_url = await self._read(conn, keepalive)
+                # Keep handling messages on the old socket until the new one says welcome
+                self.reconnects += 1
+                old, old_reader = conn, asyncio.create_task(self._drain(conn))
+                url, fresh = reconnect_url, False
+            except asyncio.CancelledError:
+                if old_reader is not None:
+                    old_reader.cancel()
+                for c in (conn, old):
+                    if c is not None:
+                        await c.close()
+                if isinstance(self._transport, AiohttpTransport):
+                    await self._transport.close()
+                raise
+            except Exception as exc:
+                log.warning("EventSub session lost: %r", exc)
+                for c in (conn, old):
+                    if c is not None:
+                        try:
+                            await c.close()
+                        except Exception:
+                            pass
+                if old_reader is not None:
+                    old_reader.cancel()
+                old = old_reader = None
+                self.session_id = None
+                self._active.clear()
+                url, fresh = self.url, True
+                failures += 1
+                delay = min(RECONNECT_MAX_SECONDS, 2 ** min(failures, 6))
+                await asyncio.sleep(delay / 2 + random.uniform(0, delay / 2))
+
+    async def _next_message(self, conn: Connection, timeout: float) -> dict:
+        while True:
+            try:
+                raw = await asyncio.wait_for(conn.receive(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise _SessionLost("keepalive timeout")
+            if raw is None:
+                raise _SessionLost("socket closed")
+            if raw:
+                return json.loads(raw)
+
+    async def _read(self, conn: Connection, keepalive: float) -> str:
+        """Handle messages until session_reconnect; returns the URL to reconnect to."""
+        while True:
+            message = await self._next_message(conn, keepalive)
+            reconnect_url = await self._handle(message)
+            if reconnect_url:
+                return reconnect_url
+
+    async def _drain(self, conn: Connection) -> None:
+        try:
+            while True:
+                await self._handle(await self._next_message(conn, RECONNECT_MAX_SECONDS))
+        except Exception:
+            pass  # the old socket going away is expected here
+
+    async def _handle(self, message: dict) -> Optional[str]:
+        metadata = message.get("metadata", {})
+        payload = message.get("payload", {})
+        message_type = metadata.get("message_type")
+        if message_type == "session_reconnect":
+            return payload["session"]["reconnect_url"]
+        if message_type == "revocation":
+            sub = payload.get("subscription", {})
+            self.revocations += 1
+            revoked = Subscription(sub.get("type"), sub.get("version"), tuple(sorted(sub.get("condition", {}).items())))
+            self._active.discard(revoked)
+            self._rejected.add(revoked)  # every revocation reason is permanent
+            log.warning("EventSub revoked %s %s: %s", revoked.type, dict(revoked.condition), sub.get("status"))
+        elif message_type == "notification":
+            message_id = metadata.get("message_id")
+            if message_id in self._seen:
+                self.duplicates += 1
+                return None
+            self._seen[message_id] = None
+            if len(self._seen) > SEEN_MESSAGE_IDS:
+                self._seen.popitem(last=False)
+            self.notifications += 1
+            handler = self._handlers.get(metadata.get("subscription_type"))
+            if handler is not None:
+                try:
+                    await handler(payload.get("event", {}))
+                except Exception:
+                    log.exception("EventSub handler failed for %s", metadata.get("subscription_type"))
+        # session_keepalive needs nothing beyond resetting the receive timeout
+        return None
+
+    async def _subscribe_all(self, session_id: str) -> None:
+        pending = [sub for sub in self.subscriptions if sub not in self._rejected]
+        self.over_budget = 0
+        for i, sub in enumerate(pending):
+            try:
+                result = await self._subscribe(sub, session_id)
+            except Exception as exc:
+                result = SubscribeResult(FAILED)
+                log.warning("EventSub subscribe failed for %s %s: %r", sub.type, dict(sub.condition), exc)
+            if result.outcome == SUBSCRIBED:
+                self._active.add(sub)
+                full = result.total_cost is not None and result.max_total_cost is not None
+                if not (full and result.total_cost >= result.max_total_cost):
+                    continue
+                left = len(pending) - i - 1
+            elif result.outcome == OVER_BUDGET:
+                left = len(pending) - i
+            else:
+                if result.outcome == REJECTED:
+                    self._rejected.add(sub)
+                log.warning("EventSub subscribe %s for %s %s", result.outcome, sub.type, dict(sub.condition))
+                continue
+            if left:
+                self.over_budget = left
+                log.info("EventSub session cost cap reached; %d subscriptions left to polling", left)
+            return
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.session_id is not None,
+            "subscriptions": len(self.subscriptions),
+            "active": len(self._active) if self.session_id else 0,
+            "sessions": self.sessions,
+            "reconnects": self.reconnects,
+            "notifications": self.notifications,
+            "duplicates": self.duplicates,
+            "revocations": self.revocations,
+            "rejected": len(self._rejected),
+            "over_budget": self.over_budget,
+        }
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from jishbot.app.db import database
+
+log = logging.getLogger(__name__)
+
+WORD_REGEX = re.compile(r"[\w']+")
+
+FilterMatch = Tuple[str, str]  # (type, pattern)
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over lowercased phrases; one pass per message."""
+
+    def __init__(self, phrases: List[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Optional[str]] = [None]
+        for phrase in phrases:
+            self._add(phrase)
+        self._build()
+
+    def _add(self, phrase: str) -> None:
+        key = phrase.lower()
+        if not key:
+            return
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+                self._goto[state][ch] = nxt
+            state = nxt
+        if self._out[state] is None:
+            self._out[state] = phrase
+
+    def _build(self) -> None:
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                if self._out[nxt] is None:
+                    self._out[nxt] = self._out[self._fail[nxt]]
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def search(self, text: str) -> Optional[str]:
+        """Return the first phrase found in text (case-insensitive)."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] is not None:
+                return out[state]
+        return None
+
+
+class CompiledFilters:
+    def __init__(self, rows) -> None:
+        self.words: Dict[str, str] = {}
+        phrases: List[str] = []
+        self.regexes: List[Tuple[re.Pattern, str]] = []
+        for row in rows:
+            ptype, pattern = row["type"], row["pattern"]
+            if ptype == "regex":
+                try:
+                    self.regexes.append((re.compile(pattern, re.IGNORECASE), pattern))
+                except re.error:
+                    log.warning("Skipping invalid regex filter %r", pattern)
+            elif ptype == "word":
+                self.words.setdefault(pattern.lower(), pattern)
+            else:  # phrase
+                phrases.append(pattern)
+        self.phrases = PhraseMatcher(phrases)
+
+    def match(self, content: str) -> Optional[FilterMatch]:
+        """Return (type, pattern) of the first filter that matches content."""
+        if self.words:
+            for token in WORD_REGEX.findall(content.lower()):
+                pattern = self.words.get(token)
+                if pattern is not None:
+                    return "word", pattern
+        if self.phrases:
+            pattern = self.phrases.search(content)
+            if pattern is not None:
+                return "phrase", pattern
+        for regex, pattern in self.regexes:
+            if regex.search(content):
+                return "regex", pattern
+        return None
+
+
+_compiled: Dict[str, CompiledFilters] = {}
+_lock = asyncio.Lock()
+
+
+async def get_compiled(channel_id: str) -> CompiledFilters:
+    compiled = _compiled.get(channel_id)
+    if compiled is not None:
+        return compiled
+    async with _lock:
+        compiled = _compiled.get(channel_id)
+        if compiled is None:
+            async with database.get_read_db() as db:
+                async with db.execute(
+                    "SELECT type, pattern FROM filters WHERE channel_id=? AND enabled=1", (channel_id,)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            compiled = CompiledFilters(rows)
+            _compiled[channel_id] = compiled
+    return compiled
+
+
+async def list_filters(channel_id: str) -> List[dict]:
+    async with database.get_read_db() as db:
+        async with db.execute("SELECT id, type, pattern, enabled FROM filters WHERE channel_id=?", (channel_id,)) as cursor:
+            rows = await cursor.fetchall()
+            return [dict(r) for r in rows]
+
+
+async def add_filter(channel_id: str, ftype: str, pattern: str, enabled: bool = True) -> None:
+    channel_id = channel_id.lower()
+    async with _lock:
+        async with database.transaction() as db:
+            await db.execute(
+                "INSERT INTO filters(channel_id, type, pattern, enabled) VALUES(?,?,?,?)",
+                (channel_id, ftype, pattern, 1 if enabled else 0),
+            )
+        _compiled.pop(channel_id, None)
+
+
+async def delete_filter(channel_id: str, filter_id: int) -> None:
+    channel_id = channel_id.lower()
+    async with _lock:
+        async with database.transaction() as db:
+            await db.execute("DELETE FROM filters WHERE channel_id=? AND id=?", (channel_id, filter_id))
+        _compiled.pop(channel_id, None)
@@ -1,78 +1,121 @@
-import json
+import asyncio
 import random
 import time
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
 from jishbot.app.db import database
 
+# channel -> keyword of its active giveaway; channels without one are absent
+_active: Dict[str, str] = {}
+# channel -> user_ids already entered in the active giveaway
+_entrants: Dict[str, Set[str]] = {}
+_loaded = False
+_lock = asyncio.Lock()
+
+
+async def load_active() -> None:
+    global _loaded
+    async with _lock:
+        async with database.get_read_db() as db:
+            async with db.execute("SELECT channel_id, keyword FROM giveaways WHERE is_active=1") as cursor:
+                rows = await cursor.fetchall()
+            active = {row["channel_id"]: row["keyword"] for row in rows if row["keyword"]}
+            entrants: Dict[str, Set[str]] = {}
+            for channel_id in active:
+                async with db.execute("SELECT user_id FROM giveaway_entries WHERE channel_id=?", (channel_id,)) as cursor:
+                    entrants[channel_id] = {row["user_id"] for row in await cursor.fetchall()}
+        _active.clear()
+        _active.update(active)
+        _entrants.clear()
+        _entrants.update(entrants)
+        _loaded = True
+
 
 async def start_giveaway(channel_id: str, keyword: str) -> None:
-    db = await database.get_db()
-    await db.execute(
-        """
-        INSERT INTO giveaways(channel_id, is_active, keyword, entries_json, started_at)
-        VALUES(?,?,?,?,?)
-        ON CONFLICT(channel_id) DO UPDATE SET is_active=excluded.is_active, keyword=excluded.keyword,
-        entries_json=excluded.entries_json, started_at=excluded.started_at
-        """,
-        (channel_id, 1, keyword.lower(), json.dumps([]), int(time.time())),
-    )
-    await db.commit()
+    channel_id = channel_id.lower()
+    if not _loaded:
+        await load_active()
+    async with _lock:
+        async with database.transaction() as db:
+            await db.execute(
+                """
+                INSERT INTO giveaways(channel_id, is_active, keyword, entries_json, started_at)
+                VALUES(?,?,?,'[]',?)
+                ON CONFLICT(channel_id) DO UPDATE SET is_active=excluded.is_active, keyword=excluded.keyword,
+                started_at=excluded.started_at
+                """,
+                (channel_id, 1, keyword.lower(), int(time.time())),
+            )
+            await db.execute("DELETE FROM giveaway_entries WHERE channel_id=?", (channel_id,))
+        _active[channel_id] = keyword.lower()
+        _entrants[channel_id] = set()
 
 
 async def end_giveaway(channel_id: str) -> None:
-    db = await database.get_db()
-    await db.execute(
-        "UPDATE giveaways SET is_active=0, keyword=NULL, entries_json='[]', started_at=NULL WHERE channel_id=?",
-        (channel_id,),
-    )
-    await db.commit()
-
-
-async def _get_giveaway(channel_id: str) -> Optional[dict]:
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT is_active, keyword, entries_json FROM giveaways WHERE channel_id=?",
-        (channel_id,),
-    ) as cursor:
-        row = await cursor.fetchone()
-    if not row:
-        return None
-    return {
-        "is_active": row["is_active"],
-        "keyword": row["keyword"],
-        "entries": json.loads(row["entries_json"]),
-    }
+    channel_id = channel_id.lower()
+    if not _loaded:
+        await load_active()
+    async with _lock:
+        async with database.transaction() as db:
+            await db.execute(
+                "UPDATE giveaways SET is_active=0, keyword=NULL, started_at=NULL WHERE channel_id=?",
+                (channel_id,),
+            )
+            await db.execute("DELETE FROM giveaway_entries WHERE channel_id=?", (channel_id,))
+        _active.pop(channel_id, None)
+        _entrants.pop(channel_id, None)
 
 
 async def handle_message(channel_id: str, user_id: str, user_name: str, content: str) -> bool:
-    giveaway = await _get_giveaway(channel_id)
-    if not giveaway or not giveaway["is_active"]:
+    if not _loaded:
+        await load_active()
+    keyword = _active.get(channel_id)
+    if not keyword or keyword not in content.lower().split():
         return False
-    keyword = giveaway["keyword"]
-    if not keyword or keyword.lower() not in content.lower().split():
+    if user_id in _entrants.get(channel_id, ()):
         return False
-    entries: List[dict] = giveaway["entries"]
-    if any(e["user_id"] == user_id for e in entries):
-        return False
-    entries.append({"user_id": user_id, "user_name": user_name})
-    db = await database.get_db()
-    await db.execute(
-        "UPDATE giveaways SET entries_json=? WHERE channel_id=?",
-        (json.dumps(entries), channel_id),
-    )
-    await db.commit()
-    return True
+    # The giveaway may have ended (or changed keyword) while this waited for the writer
+    async with database.transaction() as db:
+        cursor = await db.execute(
+            """
+            INSERT OR IGNORE INTO giveaway_entries(channel_id, user_id, user_name, entered_at)
+            SELECT ?,?,?,? WHERE EXISTS (SELECT 1 FROM giveaways WHERE channel_id=? AND is_active=1 AND keyword=?)
+            """,
+            (channel_id, user_id, user_name, int(time.time()), channel_id, keyword),
+        )
+        entered = cursor.rowcount == 1
+    if entered:
+        _entrants.setdefault(channel_id, set()).add(user_id)
+    return entered
+
+
+async def count_entries(channel_id: str) -> int:
+    async with database.get_read_db() as db:
+        async with db.execute("SELECT COUNT(*) AS n FROM giveaway_entries WHERE channel_id=?", (channel_id,)) as cursor:
+            row = await cursor.fetchone()
+            return int(row["n"])
 
 
 async def pick_winner(channel_id: str) -> Optional[Tuple[str, str]]:
-    giveaway = await _get_giveaway(channel_id)
-    if not giveaway or not giveaway["entries"]:
+    total = await count_entries(channel_id)
+    if not total:
+        return None
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT user_id, user_name FROM giveaway_entries WHERE channel_id=? LIMIT 1 OFFSET ?",
+            (channel_id, random.randrange(total)),
+        ) as cursor:
+            row = await cursor.fetchone()
+    if not row:
         return None
-    winner = random.choice(giveaway["entries"])
-    return winner["user_id"], winner["user_name"]
+    return row["user_id"], row["user_name"]
 
 
-async def get_entries(channel_id: str) -> List[dict]:
-    giveaway = await _get_giveaway(channel_id)
-    return giveaway["entries"] if giveaway else []
+async def get_entries(channel_id: str, limit: Optional[int] = None, offset: int = 0) -> List[dict]:
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT user_id, user_name FROM giveaway_entries WHERE channel_id=? ORDER BY user_id LIMIT ? OFFSET ?",
+            (channel_id, -1 if limit is None else limit, offset),
+        ) as cursor:
+            rows = await cursor.fetchall()
+            return [{"user_id": row["user_id"], "user_name": row["user_name"]} for row in rows]
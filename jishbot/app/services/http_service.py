@@ -0,0 +1,70 @@
+import importlib.util
+from typing import Optional
+
+import httpx
+
+from jishbot.app.services import metrics_service
+from jishbot.app.settings import settings
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_client: Optional[httpx.AsyncClient] = None
+_requests = 0
+_connections_opened = 0
+
+
+async def _trace(event_name: str, info: dict) -> None:
+    global _connections_opened
+    if event_name == "connection.connect_tcp.complete":
+        _connections_opened += 1
+
+
+async def _on_request(request: httpx.Request) -> None:
+    global _requests
+    _requests += 1
+    request.extensions["trace"] = _trace
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_seconds,
+        ),
+        timeout=httpx.Timeout(settings.http_timeout_seconds, connect=settings.http_connect_timeout_seconds),
+        event_hooks={"request": [_on_request]},
+    )
+
+
+def start() -> httpx.AsyncClient:
+    return get_client()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client for every outgoing request; created on first use if start() wasn't called."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def stats() -> dict:
+    return {
+        "http2": HTTP2_AVAILABLE,
+        "requests": _requests,
+        "connections_opened": _connections_opened,
+        "connections_reused": max(0, _requests - _connections_opened),
+    }
+
+
+metrics_service.register("http_client", stats)
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from jishbot.app.db import database
+from jishbot.app.services import metrics_service
+from jishbot.app.settings import settings
+
+log = logging.getLogger(__name__)
+
+InfractionRow = Tuple[str, str, str, str, str, int]
+
+HOUR = 3600
+RETENTION_INTERVAL_SECONDS = 3600
+
+
+def _rollup(rows: List[InfractionRow]) -> Counter:
+    return Counter(
+        (channel_id, created_at - created_at % HOUR, reason) for channel_id, _, _, _, reason, created_at in rows
+    )
+
+
+class InfractionJournal:
+    """Buffers infraction rows and writes them, plus their hourly rollups, in one transaction per batch."""
+
+    def __init__(self, max_rows: int, flush_ms: int) -> None:
+        self.max_rows = max(1, max_rows)
+        self.flush_ms = max(0, flush_ms)
+        self._buffer: List[InfractionRow] = []
+        self._pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def record(self, channel_id: str, user_id: str, user_name: str, type_: str, reason: str) -> None:
+        self._buffer.append((channel_id.lower(), user_id, user_name, type_, reason, int(time.time())))
+        self._pending.set()
+        if len(self._buffer) >= self.max_rows:
+            self._full.set()
+        if self._task is None:
+            self.start()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._pending.wait()
+            if not self._full.is_set():
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.flush_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            self._pending.clear()
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Failed to flush infraction journal")
+                await asyncio.sleep(1)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            rows, self._buffer = self._buffer, []
+            if not rows:
+                return
+            started = time.perf_counter()
+            try:
+                async with database.transaction() as db:
+                    await db.executemany(
+                        "INSERT INTO infractions(channel_id, user_id, user_name, type, reason, created_at) VALUES(?,?,?,?,?,?)",
+                        rows,
+                    )
+                    await db.executemany(
+                        """
+                        INSERT INTO infraction_rollups(channel_id, hour, reason, count) VALUES(?,?,?,?)
+                        ON CONFLICT(channel_id, hour, reason) DO UPDATE SET count=count+excluded.count
+                        """,
+                        [(*key, n) for key, n in _rollup(rows).items()],
+                    )
+            except Exception:
+                self._buffer[:0] = rows
+                self._pending.set()
+                raise
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.flushes += 1
+            self.rows_flushed += len(rows)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    async def close(self) -> None:
+        if self._task is not None:
+            # Wait out an in-flight batch so cancelling can't drop its rows.
+            async with self._flush_lock:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": len(self._buffer),
+            "flushes": self.flushes,
+            "rows_flushed": self.rows_flushed,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "max_flush_ms": round(self.max_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+        }
+
+
+journal = InfractionJournal(settings.infraction_flush_rows, settings.infraction_flush_ms)
+metrics_service.register("infraction_journal", journal.stats)
+
+_retention = {"runs": 0, "rows_pruned": 0, "last_run_at": 0}
+metrics_service.register("infraction_retention", lambda: dict(_retention))
+
+
+async def prune_once(now: Optional[int] = None) -> int:
+    """Delete raw infractions past the retention window, a batch per transaction. Rollups are untouched."""
+    if settings.infraction_retention_days <= 0:
+        return 0
+    cutoff = int(now if now is not None else time.time()) - settings.infraction_retention_days * 86400
+    batch = max(1, settings.infraction_prune_batch)
+    deleted = 0
+    while True:
+        async with database.transaction() as db:
+            cursor = await db.execute(
+                "DELETE FROM infractions WHERE id IN "
+                "(SELECT id FROM infractions WHERE created_at < ? ORDER BY created_at LIMIT ?)",
+                (cutoff, batch),
+            )
+            count = cursor.rowcount
+        deleted += count
+        if count < batch:
+            break
+        await asyncio.sleep(0)  # let queued writes (journal flushes, counters) take the lock between batches
+    _retention["runs"] += 1
+    _retention["rows_pruned"] += deleted
+    _retention["last_run_at"] = int(time.time())
+    return deleted
+
+
+async def run_retention_loop() -> None:
+    while True:
+        try:
+            deleted = await prune_once()
+            if deleted:
+                log.info("Pruned %d infractions older than %d days", deleted, settings.infraction_retention_days)
+        except Exception:
+            log.exception("Infraction retention pass failed")
+        await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+
+
+def window_start(hours: int = 24, now: Optional[int] = None) -> int:
+    """First rollup hour included in a `hours`-long stats window ending now."""
+    now = int(now if now is not None else time.time())
+    return now - now % HOUR - (max(1, hours) - 1) * HOUR
+
+
+async def get_stats(channel_id: str, hours: int = 24, now: Optional[int] = None) -> dict:
+    """Infraction counts for the last `hours`, by reason and by hour, read from the rollups only."""
+    since = window_start(hours, now)
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT hour, reason, count FROM infraction_rollups WHERE channel_id=? AND hour>=? ORDER BY hour",
+            (channel_id.lower(), since),
+        ) as cursor:
+            rows = await cursor.fetchall()
+    by_reason: Counter = Counter()
+    by_hour: Counter = Counter()
+    for row in rows:
+        by_reason[row["reason"]] += row["count"]
+        by_hour[row["hour"]] += row["count"]
+    return {
+        "since": since,
+        "total": sum(by_reason.values()),
+        "by_reason": [{"reason": reason, "count": n} for reason, n in by_reason.most_common()],
+        "by_hour": [{"hour": hour, "count": n} for hour, n in sorted(by_hour.items())],
+    }
+
@@ -0,0 +1,44 @@
+from typing import Callable, Dict
+
+StatsProvider = Callable[[], dict]
+
+
+class Timing:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+_providers: Dict[str, StatsProvider] = {}
+_timings: Dict[str, Timing] = {}
+
+
+def register(name: str, provider: StatsProvider) -> None:
+    _providers[name] = provider
+
+
+def observe(name: str, seconds: float) -> None:
+    timing = _timings.get(name)
+    if timing is None:
+        timing = _timings[name] = Timing()
+    timing.observe(seconds)
+
+
+def snapshot() -> dict:
+    data = {name: provider() for name, provider in _providers.items()}
+    data["timings"] = {name: timing.as_dict() for name, timing in sorted(_timings.items())}
+    return data
@@ -1,46 +1,132 @@
 import json
 import re
+import sys
 import time
-from collections import defaultdict, deque
-from typing import Deque, Dict, Optional, Tuple
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
 
 from jishbot.app.db import database
+from jishbot.app.services import filters_service, infractions_service, metrics_service
 
-MessageRecord = Tuple[float, str]
+MessageRecord = Tuple[float, int]  # (timestamp, content hash)
 
-_recent_messages: Dict[str, Dict[str, Deque[MessageRecord]]] = defaultdict(lambda: defaultdict(deque))
-_permits: Dict[str, Dict[str, float]] = defaultdict(dict)  # channel -> user_id/user_name -> expiry
+WINDOW_SECONDS = 15
+MAX_USERS_PER_CHANNEL = 5000
+MAX_PERMITS_PER_CHANNEL = 500
 
 URL_REGEX = re.compile(r"https?://[^\s]+", re.IGNORECASE)
 
 
-async def _record_infraction(channel_id: str, user_id: str, user_name: str, reason: str) -> None:
-    db = await database.get_db()
-    await db.execute(
-        "INSERT INTO infractions(channel_id, user_id, user_name, type, reason, created_at) VALUES(?,?,?,?,?,?)",
-        (channel_id, user_id, user_name, "timeout", reason, int(time.time())),
-    )
-    await db.commit()
+class UserWindow:
+    __slots__ = ("messages", "counts", "last_seen")
+
+    def __init__(self) -> None:
+        self.messages: Deque[MessageRecord] = deque()
+        self.counts: Dict[int, int] = {}
+        self.last_seen = 0.0
+
+    def push(self, now: float, content_hash: int, window: float) -> int:
+        """Add a message, drop ones older than window; return how often this content is in the window."""
+        self.messages.append((now, content_hash))
+        self.counts[content_hash] = self.counts.get(content_hash, 0) + 1
+        self.last_seen = now
+        while now - self.messages[0][0] > window:
+            _, old_hash = self.messages.popleft()
+            remaining = self.counts[old_hash] - 1
+            if remaining:
+                self.counts[old_hash] = remaining
+            else:
+                del self.counts[old_hash]
+        return self.counts[content_hash]
+
+
+class MessageWindowStore:
+    """Per-channel sliding windows keyed by user, LRU-ordered so idle users fall off the front.
+
+    Any record() also sweeps every channel at most once per window, so channels that go quiet
+    don't keep their windows around.
+    """
+
+    def __init__(self, window: float = WINDOW_SECONDS, max_users: int = MAX_USERS_PER_CHANNEL) -> None:
+        self.window = window
+        self.max_users = max_users
+        self.evicted = 0
+        self._channels: Dict[str, "OrderedDict[str, UserWindow]"] = {}
+        self._last_sweep = 0.0
+
+    def record(self, channel_id: str, user_id: str, content: str, now: float) -> Tuple[UserWindow, int]:
+        users = self._channels.get(channel_id)
+        if users is None:
+            users = self._channels[channel_id] = OrderedDict()
+        user_window = users.get(user_id)
+        if user_window is None:
+            user_window = users[user_id] = UserWindow()
+        else:
+            users.move_to_end(user_id)
+        same_count = user_window.push(now, hash(content), self.window)
+        self._evict(users, now)
+        if now - self._last_sweep >= self.window:
+            self._sweep(now)
+        return user_window, same_count
+
+    def _sweep(self, now: float) -> None:
+        self._last_sweep = now
+        for channel_id, users in list(self._channels.items()):
+            self._evict(users, now)
+            if not users:
+                del self._channels[channel_id]
+
+    def _evict(self, users: "OrderedDict[str, UserWindow]", now: float) -> None:
+        while users:
+            oldest = next(iter(users.values()))
+            if now - oldest.last_seen <= self.window and len(users) <= self.max_users:
+                break
+            users.popitem(last=False)
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        users = sum(len(u) for u in self._channels.values())
+        messages = 0
+        approx_bytes = sys.getsizeof(self._channels)
+        for channel_users in self._channels.values():
+            approx_bytes += sys.getsizeof(channel_users)
+            for user_id, user_window in channel_users.items():
+                messages += len(user_window.messages)
+                approx_bytes += (
+                    sys.getsizeof(user_id)
+                    + sys.getsizeof(user_window)
+                    + sys.getsizeof(user_window.messages)
+                    + sys.getsizeof(user_window.counts)
+                    + len(user_window.messages) * 64  # tuple + float + int per record
+                )
+        return {
+            "channels": len(self._channels),
+            "users": users,
+            "messages": messages,
+            "evicted": self.evicted,
+            "approx_bytes": approx_bytes,
+        }
 
 
-async def _get_filters(channel_id: str):
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT type, pattern FROM filters WHERE channel_id=? AND enabled=1", (channel_id,)
-    ) as cursor:
-        return await cursor.fetchall()
+_windows = MessageWindowStore()
+_permits: Dict[str, Dict[str, float]] = {}  # channel -> user_id/user_name -> expiry
+metrics_service.register("moderation_windows", _windows.stats)
+
+
+async def _record_infraction(channel_id: str, user_id: str, user_name: str, reason: str) -> None:
+    infractions_service.journal.record(channel_id, user_id, user_name, "timeout", reason)
 
 
 async def _get_link_settings(channel_id: str) -> dict:
-    db = await database.get_db()
-    async with db.execute(
-        """
-        SELECT enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json
-        FROM link_settings WHERE channel_id=?
-        """,
-        (channel_id,),
-    ) as cursor:
-        row = await cursor.fetchone()
+    async with database.get_read_db() as db:
+        async with db.execute(
+            """
+            SELECT enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json
+            FROM link_settings WHERE channel_id=?
+            """,
+            (channel_id,),
+        ) as cursor:
+            row = await cursor.fetchone()
     if not row:
         return {
             "enabled": 1,
@@ -80,16 +166,17 @@ async def check_message(
     content: str,
     is_mod: bool,
     is_sub: bool,
-    is_regular: bool,
+    is_regular: Callable[[], Awaitable[bool]],
 ) -> Optional[str]:
-    """Return reason string when a moderation action should occur."""
+    """Return reason string when a moderation action should occur.
+
+    is_regular is only awaited when a rule needs it (a link from a non-mod, non-sub).
+    """
     if is_mod:
         return None
     now = time.time()
-    recent = _recent_messages[channel_id][user_id]
-    recent.append((now, content))
-    while recent and now - recent[0][0] > 15:
-        recent.popleft()
+    user_window, same_count = _windows.record(channel_id, user_id, content, now)
+    recent = user_window.messages
 
     # Flood detection
     if len(recent) >= 6 and now - recent[0][0] <= 10:
@@ -97,7 +184,6 @@ async def check_message(
         return "message flood"
 
     # Repeated message
-    same_count = sum(1 for _, c in recent if c == content)
     if same_count >= 3:
         await _record_infraction(channel_id, user_id, user_name, "repeated message")
         return "repeated message"
@@ -111,46 +197,55 @@ async def check_message(
         return "symbol spam"
 
     # Filters
-    for row in await _get_filters(channel_id):
-        ptype, pattern = row["type"], row["pattern"]
-        if ptype == "regex":
-            if re.search(pattern, content, re.IGNORECASE):
-                await _record_infraction(channel_id, user_id, user_name, f"filter regex: {pattern}")
-                return "filtered regex"
-        elif ptype == "word":
-            tokens = {w.lower() for w in re.findall(r"[\\w']+", content)}
-            if pattern.lower() in tokens:
-                await _record_infraction(channel_id, user_id, user_name, f"filter word: {pattern}")
-                return "filtered word"
-        else:  # phrase
-            if pattern.lower() in content.lower():
-                await _record_infraction(channel_id, user_id, user_name, f"filter phrase: {pattern}")
-                return "filtered phrase"
+    compiled = await filters_service.get_compiled(channel_id)
+    matched = compiled.match(content)
+    if matched:
+        ptype, pattern = matched
+        await _record_infraction(channel_id, user_id, user_name, f"filter {ptype}: {pattern}")
+        return f"filtered {ptype}"
 
     # Link protection
+    match = URL_REGEX.search(content)
+    if not match:
+        return None
     link_settings = await _get_link_settings(channel_id)
     if link_settings["enabled"]:
-        permitted_until = max(
-            _permits[channel_id].get(user_id, 0),
-            _permits[channel_id].get(user_name.lower(), 0),
-        )
-        if now < permitted_until:
+        if _is_permitted(channel_id, (user_id, user_name.lower()), now):
             return None
         if is_mod and link_settings["allow_mod"]:
             return None
         if is_sub and link_settings["allow_sub"]:
             return None
-        if is_regular and link_settings["allow_regular"]:
+        if link_settings["allow_regular"] and await is_regular():
             return None
-        match = URL_REGEX.search(content)
-        if match:
-            url = match.group(0)
-            allowed = any(domain.lower() in url.lower() for domain in link_settings["allowed_domains"])
-            if not allowed:
-                await _record_infraction(channel_id, user_id, user_name, "link protection")
-                return "link protection"
+        url = match.group(0)
+        allowed = any(domain.lower() in url.lower() for domain in link_settings["allowed_domains"])
+        if not allowed:
+            await _record_infraction(channel_id, user_id, user_name, "link protection")
+            return "link protection"
     return None
 
 
+def _is_permitted(channel_id: str, keys: Tuple[str, ...], now: float) -> bool:
+    permits = _permits.get(channel_id)
+    if not permits:
+        return False
+    for key in keys:
+        expiry = permits.get(key)
+        if expiry is None:
+            continue
+        if now < expiry:
+            return True
+        del permits[key]
+    return False
+
+
 def permit_user(channel_id: str, user_id_or_name: str, seconds: int = 60) -> None:
-    _permits[channel_id][user_id_or_name] = time.time() + seconds
+    now = time.time()
+    permits = _permits.setdefault(channel_id, {})
+    for key in [k for k, expiry in permits.items() if expiry <= now]:
+        del permits[key]
+    permits.pop(user_id_or_name, None)
+    permits[user_id_or_name] = now + seconds
+    while len(permits) > MAX_PERMITS_PER_CHANNEL:
+        del permits[next(iter(permits))]
@@ -1,42 +1,50 @@
 import asyncio
+import logging
 import time
-from typing import Dict, Optional
-
-import httpx
+from typing import Dict, List, Optional
 
 from jishbot.app.db import database
-from jishbot.app.services import twitch_api_service
+from jishbot.app.services import eventsub_service, http_service, metrics_service, twitch_api_service
+from jishbot.app.settings import settings
+
+log = logging.getLogger(__name__)
 
 POLL_SECONDS = 120  # Twitch rate limits are friendly at this cadence
+WEBHOOK_CONCURRENCY = 5
+
+# channel login -> its (stream.online, stream.offline) subscriptions while EventSub is running
+_push_subscriptions: Dict[str, tuple] = {}
+_push: Optional[eventsub_service.EventSubClient] = None
+# Serialises status read/notify/write between the poller and EventSub so a go-live isn't sent twice
+_status_lock = asyncio.Lock()
 
 
 async def set_webhook(channel_id: str, webhook_url: Optional[str]) -> None:
-    db = await database.get_db()
-    await db.execute(
-        """
-        INSERT INTO notifications(channel_id, webhook_url, last_status, last_notified_at)
-        VALUES(?,?,NULL,0)
-        ON CONFLICT(channel_id) DO UPDATE SET webhook_url=excluded.webhook_url
-        """,
-        (channel_id, webhook_url),
-    )
-    await db.commit()
+    channel_id = channel_id.lower()
+    async with database.transaction() as db:
+        await db.execute(
+            """
+            INSERT INTO notifications(channel_id, webhook_url, last_status, last_notified_at)
+            VALUES(?,?,NULL,0)
+            ON CONFLICT(channel_id) DO UPDATE SET webhook_url=excluded.webhook_url
+            """,
+            (channel_id, webhook_url),
+        )
 
 
 async def get_webhook(channel_id: str) -> Optional[str]:
-    db = await database.get_db()
-    async with db.execute("SELECT webhook_url FROM notifications WHERE channel_id=?", (channel_id,)) as cursor:
-        row = await cursor.fetchone()
-        return row["webhook_url"] if row else None
+    async with database.get_read_db() as db:
+        async with db.execute("SELECT webhook_url FROM notifications WHERE channel_id=?", (channel_id,)) as cursor:
+            row = await cursor.fetchone()
+            return row["webhook_url"] if row else None
 
 
 async def _update_status(channel_id: str, status: str) -> None:
-    db = await database.get_db()
-    await db.execute(
-        "UPDATE notifications SET last_status=?, last_notified_at=? WHERE channel_id=?",
-        (status, int(time.time()), channel_id),
-    )
-    await db.commit()
+    async with database.transaction() as db:
+        await db.execute(
+            "UPDATE notifications SET last_status=?, last_notified_at=? WHERE channel_id=?",
+            (status, int(time.time()), channel_id),
+        )
 
 
 async def _send_webhook(webhook_url: str, title: str, game: str, channel: str) -> None:
@@ -52,38 +60,170 @@ async def _send_webhook(webhook_url: str, title: str, game: str, channel: str) -
             }
         ],
     }
-    async with httpx.AsyncClient() as client:
-        await client.post(webhook_url, json=data, timeout=10)
+    client = http_service.get_client()
+    await client.post(webhook_url, json=data, timeout=10)
 
 
 async def send_test(webhook_url: str, channel: str) -> None:
     await _send_webhook(webhook_url, "This is a test notification", "Test", channel)
 
 
-async def _check_channel(channel: str) -> None:
-    webhook = await get_webhook(channel)
-    if not webhook:
-        return
-    is_live, title, game = await twitch_api_service.get_stream_status(channel)
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT last_status FROM notifications WHERE channel_id=?", (channel,)
-    ) as cursor:
-        row = await cursor.fetchone()
-        last_status = row["last_status"] if row else None
-    if is_live and last_status != "live":
+async def _load_watched(channels: List[str]) -> list:
+    """Webhook and last status for every polled channel that has a webhook, in one query."""
+    wanted = set(channels)
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT channel_id, webhook_url, last_status FROM notifications WHERE webhook_url IS NOT NULL AND webhook_url != ''"
+        ) as cursor:
+            rows = await cursor.fetchall()
+    return [row for row in rows if row["channel_id"] in wanted]
+
+
+async def _notify_live(semaphore: asyncio.Semaphore, row, stream: dict) -> bool:
+    async with semaphore:
         try:
-            await _send_webhook(webhook, title, game, channel)
-            await _update_status(channel, "live")
+            await _send_webhook(row["webhook_url"], stream.get("title"), stream.get("game_name"), row["channel_id"])
+            return True
         except Exception:
-            # Swallow errors to avoid crashing loop
-            pass
-    elif not is_live and last_status != "offline":
-        await _update_status(channel, "offline")
+            log.warning("Live webhook failed for %s", row["channel_id"], exc_info=True)
+            return False
+
+
+async def poll_once(channels: List[str]) -> None:
+    watched = await _load_watched(channels)
+    if not watched:
+        return
+    # Both lookups are batched 100 per Helix request and yield to chat commands
+    users = await twitch_api_service.get_users([row["channel_id"] for row in watched], twitch_api_service.BACKGROUND)
+    streams = await twitch_api_service.get_streams(
+        [user["id"] for user in users.values()], twitch_api_service.BACKGROUND
+    )
+    async with _status_lock:
+        # Re-read statuses: an EventSub notification may have landed during the Helix calls
+        await _apply_poll(await _load_watched(channels), users, streams)
+
+
+async def _apply_poll(watched: list, users: Dict[str, dict], streams: Dict[str, Optional[dict]]) -> None:
+    went_live = []
+    went_offline = []
+    for row in watched:
+        user = users.get(row["channel_id"])
+        stream = streams.get(user["id"]) if user else None
+        if stream and row["last_status"] != "live":
+            went_live.append((row, stream))
+        elif not stream and row["last_status"] != "offline":
+            went_offline.append(row["channel_id"])
+
+    semaphore = asyncio.Semaphore(WEBHOOK_CONCURRENCY)
+    sent = await asyncio.gather(*(_notify_live(semaphore, row, stream) for row, stream in went_live))
+    now = int(time.time())
+    updates = [("live", now, row["channel_id"]) for (row, _), ok in zip(went_live, sent) if ok]
+    updates += [("offline", now, channel_id) for channel_id in went_offline]
+    if updates:
+        async with database.transaction() as db:
+            await db.executemany(
+                "UPDATE notifications SET last_status=?, last_notified_at=? WHERE channel_id=?", updates
+            )
+
+
+async def _status_row(channel_id: str):
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT webhook_url, last_status FROM notifications WHERE channel_id=?", (channel_id,)
+        ) as cursor:
+            return await cursor.fetchone()
+
+
+async def handle_stream_online(event: dict) -> None:
+    channel = event["broadcaster_user_login"]
+    twitch_api_service.invalidate_stream(event["broadcaster_user_id"])
+    async with _status_lock:
+        row = await _status_row(channel)
+        if not row or not row["webhook_url"] or row["last_status"] == "live":
+            return
+        # stream.online carries no title/game; the channel endpoint has both
+        info = await twitch_api_service.get_channel_info(channel) or {}
+        await _send_webhook(row["webhook_url"], info.get("title"), info.get("game_name"), channel)
+        await _update_status(channel, "live")
+
+
+async def handle_stream_offline(event: dict) -> None:
+    channel = event["broadcaster_user_login"]
+    twitch_api_service.invalidate_stream(event["broadcaster_user_id"])
+    async with _status_lock:
+        row = await _status_row(channel)
+        if row and row["last_status"] != "offline":
+            await _update_status(channel, "offline")
+
+
+async def _subscribe(sub: eventsub_service.Subscription, session_id: str) -> eventsub_service.SubscribeResult:
+    status, body = await twitch_api_service.create_eventsub_subscription(
+        sub.type, sub.version, dict(sub.condition), session_id
+    )
+    if status == 202:
+        return eventsub_service.SubscribeResult(
+            eventsub_service.SUBSCRIBED, body.get("total_cost"), body.get("max_total_cost")
+        )
+    if status == 429:
+        return eventsub_service.SubscribeResult(eventsub_service.OVER_BUDGET)
+    if status in (400, 401, 403, 409):
+        # bad condition, token without the scope, or a duplicate: the next session would fare no better
+        return eventsub_service.SubscribeResult(eventsub_service.REJECTED)
+    return eventsub_service.SubscribeResult(eventsub_service.FAILED)
+
+
+async def run_eventsub(channels: List[str], transport: Optional[eventsub_service.Transport] = None) -> None:
+    """Push go-live/offline through EventSub; run_poll_loop keeps reconciling the covered channels slowly."""
+    global _push
+    if not settings.twitch_bot_token:
+        # WebSocket subscriptions refuse the app token that Helix calls fall back to
+        log.warning("EventSub needs TWITCH_BOT_TOKEN; live notifications are polled only")
+        return
+    while True:
+        try:
+            users = await twitch_api_service.get_users(channels)
+            break
+        except twitch_api_service.HelixError:
+            log.warning("EventSub: can't resolve channel ids yet, retrying")
+            await asyncio.sleep(POLL_SECONDS)
+    for login, user in users.items():
+        _push_subscriptions[login] = (
+            eventsub_service.Subscription.of("stream.online", "1", broadcaster_user_id=user["id"]),
+            eventsub_service.Subscription.of("stream.offline", "1", broadcaster_user_id=user["id"]),
+        )
+    client = eventsub_service.EventSubClient(
+        [sub for subs in _push_subscriptions.values() for sub in subs],
+        _subscribe,
+        transport=transport,
+        url=settings.eventsub_ws_url,
+    )
+    client.on("stream.online", handle_stream_online)
+    client.on("stream.offline", handle_stream_offline)
+    metrics_service.register("eventsub", client.stats)
+    _push = client
+    await client.run()
+
+
+def _push_covered(channel: str) -> bool:
+    subs = _push_subscriptions.get(channel)
+    return _push is not None and subs is not None and all(_push.is_active(sub) for sub in subs)
 
 
 async def run_poll_loop(channels: list[str]) -> None:
+    last_full = 0.0
     while True:
-        for ch in channels:
-            await _check_channel(ch)
+        # Channels EventSub is watching only need the slow reconciling pass
+        now = time.monotonic()
+        full = now - last_full >= settings.notification_reconcile_seconds
+        targets = channels if full else [ch for ch in channels if not _push_covered(ch)]
+        if full:
+            last_full = now
+        try:
+            if targets:
+                await poll_once(targets)
+        except twitch_api_service.HelixError:
+            # Leave last_status alone; a failed lookup isn't the stream going offline
+            log.warning("Skipping notification poll: Helix unavailable")
+        except Exception:
+            log.exception("Notification poll failed")
         await asyncio.sleep(POLL_SECONDS)
@@ -0,0 +1,254 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Deque, Dict, List, Optional
+
+from jishbot.app.services import metrics_service
+from jishbot.app.settings import settings
+
+RATE_WINDOW_SECONDS = 30  # Twitch counts chat limits per 30s
+MAX_MESSAGE_LENGTH = 450
+COALESCE_SEPARATOR = " | "
+
+
+class Priority(IntEnum):
+    """Lower value goes out first."""
+
+    MODERATION = 0  # /slow, /clear, ... issued by mods
+    COMMAND = 1  # replies to chat commands
+    NOTICE = 2  # confirmations such as "X added as regular"
+    TIMER = 3  # timers and other announcements
+
+
+# Seconds a message may wait in the queue before it's dropped instead of sent late
+DEFAULT_TTL_SECONDS = {
+    Priority.MODERATION: 30,
+    Priority.COMMAND: 30,
+    Priority.NOTICE: 60,
+    Priority.TIMER: 120,
+}
+
+
+@dataclass
+class OutboundMessage:
+    content: str
+    priority: Priority
+    enqueued_at: float
+    deadline: float
+
+
+class OutboundQueue:
+    """Bounded per-channel queue with one FIFO lane per priority.
+
+    When full, the oldest message in the least important non-empty lane is dropped; a new message
+    that is less important than everything queued is dropped instead. With coalesce on, consecutive
+    NOTICE/TIMER messages in a lane are joined into one chat line up to MAX_MESSAGE_LENGTH.
+    """
+
+    def __init__(self, maxlen: int, coalesce: bool = False) -> None:
+        self.maxlen = max(1, maxlen)
+        self.coalesce = coalesce
+        self._lanes: Dict[Priority, Deque[OutboundMessage]] = {p: deque() for p in Priority}
+        self._size = 0
+        self._not_empty = asyncio.Event()
+        self.dropped_full = 0
+        self.dropped_expired = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def put(self, content: str, priority: Priority, ttl: Optional[float] = None) -> bool:
+        now = time.monotonic()
+        if ttl is None:
+            ttl = DEFAULT_TTL_SECONDS[priority]
+        if self._size >= self.maxlen:
+            victim = max(p for p, lane in self._lanes.items() if lane)
+            if victim < priority:
+                self.dropped_full += 1
+                return False
+            self._lanes[victim].popleft()
+            self._size -= 1
+            self.dropped_full += 1
+        self._lanes[priority].append(OutboundMessage(content, priority, now, now + ttl))
+        self._size += 1
+        self._not_empty.set()
+        return True
+
+    async def wait(self) -> None:
+        while not self._size:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+    def pop(self) -> Optional[OutboundMessage]:
+        """Return the most urgent unexpired message, discarding expired ones on the way."""
+        now = time.monotonic()
+        for lane in self._lanes.values():
+            while lane:
+                message = lane.popleft()
+                self._size -= 1
+                if message.deadline < now:
+                    self.dropped_expired += 1
+                    continue
+                if self.coalesce and message.priority >= Priority.NOTICE and _can_coalesce(message.content):
+                    self._coalesce_into(message, lane, now)
+                return message
+        return None
+
+    def _coalesce_into(self, message: OutboundMessage, lane: Deque[OutboundMessage], now: float) -> None:
+        parts = [message.content]
+        length = len(message.content)
+        while lane:
+            nxt = lane[0]
+            if nxt.deadline < now:
+                lane.popleft()
+                self._size -= 1
+                self.dropped_expired += 1
+                continue
+            if not _can_coalesce(nxt.content):
+                break
+            if length + len(COALESCE_SEPARATOR) + len(nxt.content) > MAX_MESSAGE_LENGTH:
+                break
+            lane.popleft()
+            self._size -= 1
+            parts.append(nxt.content)
+            length += len(COALESCE_SEPARATOR) + len(nxt.content)
+        if len(parts) > 1:
+            self.coalesced += len(parts) - 1
+            message.content = COALESCE_SEPARATOR.join(parts)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._size,
+            "lanes": {p.name.lower(): len(lane) for p, lane in self._lanes.items()},
+            "dropped_full": self.dropped_full,
+            "dropped_expired": self.dropped_expired,
+            "coalesced": self.coalesced,
+        }
+
+
+def _can_coalesce(content: str) -> bool:
+    # Chat commands like /slow or .me must stay on their own line.
+    return not content.startswith(("/", "."))
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_second: float) -> None:
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self._updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until one token is available (0 when one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.refill_per_second
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def refund(self, now: float) -> None:
+        """Return a token that was taken but not spent."""
+        self._refill(now)
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def resize(self, capacity: float, refill_per_second: float) -> None:
+        self._refill(time.monotonic())
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = min(self.tokens, capacity)
+
+
+class OutboundLimiter:
+    """Per-channel buckets sized by the bot's role there, plus account-wide buckets.
+
+    Twitch counts the non-mod limit across the whole account, so sends to channels where the bot
+    isn't mod/broadcaster also draw from a shared user-rate bucket.
+    """
+
+    def __init__(self, user_limit: int, mod_limit: int, global_limit: int) -> None:
+        self.user_limit = user_limit
+        self.mod_limit = mod_limit
+        self._global = TokenBucket(global_limit, global_limit / RATE_WINDOW_SECONDS)
+        self._user_global = TokenBucket(user_limit, user_limit / RATE_WINDOW_SECONDS)
+        self._channels: Dict[str, TokenBucket] = {}
+        self._privileged: Dict[str, bool] = {}
+        self.throttled = 0
+
+    def _bucket_shape(self, privileged: bool):
+        if privileged:
+            return self.mod_limit, self.mod_limit / RATE_WINDOW_SECONDS
+        # Twitch also drops non-mod messages sent faster than ~1/s in a channel, so no burst there.
+        return 1, self.user_limit / RATE_WINDOW_SECONDS
+
+    def _bucket(self, channel_name: str) -> TokenBucket:
+        bucket = self._channels.get(channel_name)
+        if bucket is None:
+            privileged = self._privileged.get(channel_name, False)
+            bucket = self._channels[channel_name] = TokenBucket(*self._bucket_shape(privileged))
+        return bucket
+
+    def set_privileged(self, channel_name: str, privileged: bool) -> None:
+        """Record whether the bot is mod/broadcaster in a channel and resize its bucket."""
+        if self._privileged.get(channel_name) == privileged:
+            return
+        self._privileged[channel_name] = privileged
+        if channel_name in self._channels:
+            self._channels[channel_name].resize(*self._bucket_shape(privileged))
+
+    def _buckets(self, channel_name: str) -> List[TokenBucket]:
+        buckets = [self._bucket(channel_name), self._global]
+        if not self._privileged.get(channel_name, False):
+            buckets.append(self._user_global)
+        return buckets
+
+    async def acquire(self, channel_name: str) -> None:
+        while True:
+            buckets = self._buckets(channel_name)
+            now = time.monotonic()
+            wait = max(b.delay(now) for b in buckets)
+            if wait <= 0:
+                for b in buckets:
+                    b.take(now)
+                return
+            self.throttled += 1
+            await asyncio.sleep(wait)
+
+    def release(self, channel_name: str) -> None:
+        """Give back what acquire took when there turned out to be nothing to send."""
+        now = time.monotonic()
+        for b in self._buckets(channel_name):
+            b.refund(now)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        for bucket in (self._global, self._user_global, *self._channels.values()):
+            bucket.delay(now)  # refills
+        return {
+            "global_tokens": round(self._global.tokens, 2),
+            "user_global_tokens": round(self._user_global.tokens, 2),
+            "throttled": self.throttled,
+            "channels": {
+                name: {
+                    "privileged": self._privileged.get(name, False),
+                    "tokens": round(bucket.tokens, 2),
+                    "capacity": bucket.capacity,
+                }
+                for name, bucket in self._channels.items()
+            },
+        }
+
+
+limiter = OutboundLimiter(settings.chat_rate_user, settings.chat_rate_mod, settings.chat_rate_global)
+metrics_service.register("outbound_limiter", limiter.stats)
@@ -1,4 +1,6 @@
-from typing import Any, Literal
+import asyncio
+import time
+from typing import Any, Dict, List, Literal, Optional
 
 from jishbot.app.db import database
 
@@ -13,12 +15,79 @@ _rank = {
 }
 
 
-async def is_regular(channel_id: str, user_id: str) -> bool:
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT 1 FROM regulars WHERE channel_id=? AND user_id=? LIMIT 1", (channel_id, user_id)
-    ) as cursor:
-        return await cursor.fetchone() is not None
+# channel -> user_id -> user_name, mirrored from the regulars table
+_regulars: Dict[str, Dict[str, str]] = {}
+_all_loaded = False
+_lock = asyncio.Lock()
+
+
+async def load_regulars() -> None:
+    """Mirror the whole regulars table in memory; channels without rows are then known-empty."""
+    global _all_loaded
+    async with _lock:
+        async with database.get_read_db() as db:
+            async with db.execute("SELECT channel_id, user_id, user_name FROM regulars") as cursor:
+                rows = await cursor.fetchall()
+        regulars: Dict[str, Dict[str, str]] = {}
+        for row in rows:
+            regulars.setdefault(row["channel_id"], {})[row["user_id"]] = row["user_name"]
+        _regulars.clear()
+        _regulars.update(regulars)
+        _all_loaded = True
+
+
+async def _channel_regulars(channel_id: str) -> Dict[str, str]:
+    regulars = _regulars.get(channel_id)
+    if regulars is not None:
+        return regulars
+    if _all_loaded:
+        return _regulars.setdefault(channel_id, {})
+    async with _lock:
+        regulars = _regulars.get(channel_id)
+        if regulars is None:
+            async with database.get_read_db() as db:
+                async with db.execute(
+                    "SELECT user_id, user_name FROM regulars WHERE channel_id=?", (channel_id,)
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            regulars = _regulars[channel_id] = {row["user_id"]: row["user_name"] for row in rows}
+    return regulars
+
+
+async def is_regular(channel_id: str, user_id: str, user_name: Optional[str] = None) -> bool:
+    # Regulars added from chat are keyed by login, so accept either the numeric id or the login.
+    regulars = await _channel_regulars(channel_id)
+    return user_id in regulars or (user_name is not None and user_name.lower() in regulars)
+
+
+async def add_regular(channel_id: str, user_name: str) -> None:
+    channel_id = channel_id.lower()
+    await _channel_regulars(channel_id)
+    async with _lock:
+        async with database.transaction() as db:
+            await db.execute(
+                """
+                INSERT INTO regulars(channel_id, user_id, user_name, added_at)
+                VALUES(?,?,?,?)
+                ON CONFLICT(channel_id, user_id) DO UPDATE SET user_name=excluded.user_name
+                """,
+                (channel_id, user_name.lower(), user_name, int(time.time())),
+            )
+        _regulars[channel_id][user_name.lower()] = user_name
+
+
+async def remove_regular(channel_id: str, user_name: str) -> None:
+    channel_id = channel_id.lower()
+    await _channel_regulars(channel_id)
+    async with _lock:
+        async with database.transaction() as db:
+            await db.execute("DELETE FROM regulars WHERE channel_id=? AND user_id=?", (channel_id, user_name.lower()))
+        _regulars[channel_id].pop(user_name.lower(), None)
+
+
+async def list_regulars(channel_id: str) -> List[str]:
+    regulars = await _channel_regulars(channel_id)
+    return list(regulars.values())
 
 
 async def has_permission(msg: Any, required: PermissionLevel) -> bool:
@@ -40,6 +109,6 @@ async def has_permission(msg: Any, required: PermissionLevel) -> bool:
     if required in ("subscriber", "regular"):
         if author.is_subscriber and _rank["subscriber"] >= _rank[required]:
             return True
-        if required == "regular" and await is_regular(channel_id, user_id):
+        if required == "regular" and await is_regular(channel_id, user_id, author.name):
             return True
     return required == "everyone"
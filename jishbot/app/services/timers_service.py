@@ -1,61 +1,157 @@
 import asyncio
+import heapq
+import itertools
 import json
+import logging
 import random
 import time
-from typing import Awaitable, Callable, Dict, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 from jishbot.app.db import database
+from jishbot.app.db.models import Timer
+from jishbot.app.services import metrics_service
+
+log = logging.getLogger(__name__)
 
 SendFunc = Callable[[str, str], Awaitable[None]]
 
+JITTER_SECONDS = 30  # max per-channel offset so many channels don't fire together
+
 
 class TimersService:
+    """One scheduler task for every channel, sleeping until the earliest timer is due."""
+
     def __init__(self) -> None:
-        self._tasks: Dict[str, asyncio.Task] = {}
+        self._send_funcs: Dict[str, SendFunc] = {}
+        self._timers: Dict[str, Dict[int, Timer]] = {}
+        self._generation: Dict[str, int] = {}
+        self._jitter: Dict[str, float] = {}
+        # (fire_at, seq, channel, timer_id, generation); entries from an older generation are stale
+        self._heap: List[Tuple[float, int, str, int, int]] = []
+        self._seq = itertools.count()
+        # channel -> timers that are due but waiting for chat activity
+        self._waiting: Dict[str, Set[int]] = {}
         self._last_activity: Dict[str, float] = {}
         self._last_fire: Dict[Tuple[str, int], float] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
 
     async def _fetch_timers(self, channel_id: str):
-        db = await database.get_db()
-        async with db.execute(
-            "SELECT id, name, messages_json, interval_minutes, require_chat_activity FROM timers WHERE channel_id=? AND enabled=1",
-            (channel_id,),
-        ) as cursor:
-            return await cursor.fetchall()
+        async with database.get_read_db() as db:
+            async with db.execute(
+                "SELECT id, name, messages_json, interval_minutes, require_chat_activity FROM timers WHERE channel_id=? AND enabled=1",
+                (channel_id,),
+            ) as cursor:
+                return await cursor.fetchall()
 
     def note_activity(self, channel_id: str) -> None:
-        self._last_activity[channel_id] = time.time()
+        now = time.time()
+        self._last_activity[channel_id] = now
+        waiting = self._waiting.pop(channel_id, None)
+        if waiting:
+            for timer_id in waiting:
+                self._push(now, channel_id, timer_id)
+            self._wakeup.set()
 
     async def start(self, channel_id: str, send_func: SendFunc) -> None:
-        if channel_id in self._tasks:
+        if channel_id in self._send_funcs:
             return
+        self._send_funcs[channel_id] = send_func
         self._last_activity.setdefault(channel_id, time.time())
-        self._tasks[channel_id] = asyncio.create_task(self._runner(channel_id, send_func))
+        self._jitter.setdefault(channel_id, random.uniform(0, JITTER_SECONDS))
+        await self.reload(channel_id)
+        if self._task is None:
+            self._task = asyncio.create_task(self._runner())
+
+    async def reload(self, channel_id: str) -> None:
+        """Re-read a channel's timer definitions; call after any write to its timers."""
+        if channel_id not in self._send_funcs:
+            return
+        rows = await self._fetch_timers(channel_id)
+        timers = {
+            row["id"]: Timer(
+                id=row["id"],
+                channel_id=channel_id,
+                name=row["name"],
+                messages=json.loads(row["messages_json"]),
+                interval_minutes=row["interval_minutes"],
+                require_chat_activity=row["require_chat_activity"],
+                enabled=1,
+            )
+            for row in rows
+        }
+        self._timers[channel_id] = timers
+        self._generation[channel_id] = self._generation.get(channel_id, 0) + 1
+        self._waiting.pop(channel_id, None)
+        now = time.time()
+        for timer in timers.values():
+            last_fire = self._last_fire.get((channel_id, timer.id))
+            fire_at = last_fire + timer.interval_minutes * 60 if last_fire else now
+            self._push(max(fire_at, now) + self._jitter[channel_id], channel_id, timer.id)
+        self._wakeup.set()
+
+    def _push(self, fire_at: float, channel_id: str, timer_id: int) -> None:
+        entry = (fire_at, next(self._seq), channel_id, timer_id, self._generation[channel_id])
+        heapq.heappush(self._heap, entry)
 
-    async def _runner(self, channel_id: str, send_func: SendFunc) -> None:
+    async def _runner(self) -> None:
         while True:
             now = time.time()
-            timers = await self._fetch_timers(channel_id)
-            for row in timers:
-                last_fire = self._last_fire.get((channel_id, row["id"]), 0)
-                if now - last_fire < row["interval_minutes"] * 60:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, channel_id, timer_id, generation = heapq.heappop(self._heap)
+                if generation != self._generation.get(channel_id):
                     continue
-                if row["require_chat_activity"]:
-                    last_activity = self._last_activity.get(channel_id, 0)
-                    if last_activity < last_fire or now - last_activity > row["interval_minutes"] * 60:
-                        continue
-                messages = json.loads(row["messages_json"])
-                if not messages:
+                timer = self._timers.get(channel_id, {}).get(timer_id)
+                if timer is None:
                     continue
-                message = random.choice(messages)
-                await send_func(channel_id, message)
-                self._last_fire[(channel_id, row["id"])] = now
-            await asyncio.sleep(10)
+                try:
+                    await self._fire(timer, now)
+                except Exception:
+                    log.exception("Timer %s failed in %s", timer.name, channel_id)
+            self._wakeup.clear()
+            delay = self._heap[0][0] - time.time() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, timer: Timer, now: float) -> None:
+        channel_id = timer.channel_id
+        key = (channel_id, timer.id)
+        interval = timer.interval_minutes * 60
+        if timer.require_chat_activity:
+            last_fire = self._last_fire.get(key, 0)
+            last_activity = self._last_activity.get(channel_id, 0)
+            if last_activity < last_fire or now - last_activity > interval:
+                # note_activity reschedules it on the next chat message
+                self._waiting.setdefault(channel_id, set()).add(timer.id)
+                return
+        try:
+            if timer.messages:
+                await self._send_funcs[channel_id](channel_id, random.choice(timer.messages))
+                self._last_fire[key] = now
+        finally:
+            # A failed send still waits out the interval; a reload during the send already rescheduled it
+            if self._timers.get(channel_id, {}).get(timer.id) is timer:
+                self._push(now + interval, channel_id, timer.id)
 
     async def stop_all(self) -> None:
-        for task in self._tasks.values():
-            task.cancel()
-        self._tasks.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._send_funcs.clear()
+        self._heap.clear()
+        self._waiting.clear()
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self._send_funcs),
+            "timers": sum(len(t) for t in self._timers.values()),
+            "scheduled": len(self._heap),
+            "waiting_for_activity": sum(len(w) for w in self._waiting.values()),
+            "next_due_in": round(self._heap[0][0] - time.time(), 3) if self._heap else None,
+        }
 
 
 timers_service = TimersService()
+metrics_service.register("timers", timers_service.stats)
@@ -1,30 +1,45 @@
 import asyncio
+import json
+import logging
+import random
 import time
-from typing import Optional
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
 import httpx
 
+from jishbot.app.db import database
+from jishbot.app.services import http_service, metrics_service
 from jishbot.app.settings import settings
 
+log = logging.getLogger(__name__)
+
+HELIX_MAX_IDS = 100  # Helix accepts up to 100 login/id params per request
+BATCH_WINDOW_SECONDS = 0.02
+
+# Helix request priorities; interactive (chat commands) always goes ahead of background (polling)
+INTERACTIVE = 0
+BACKGROUND = 1
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 10.0
+
 _app_token: Optional[str] = None
 _app_token_expiry = 0.0
-_user_cache: dict[str, dict] = {}
-_creation_cache: dict[str, str] = {}
 
 
 async def _fetch_app_token() -> str:
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://id.twitch.tv/oauth2/token",
-            params={
-                "client_id": settings.twitch_client_id,
-                "client_secret": settings.twitch_client_secret,
-                "grant_type": "client_credentials",
-            },
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        return data["access_token"], time.time() + data.get("expires_in", 3600) - 60
+    client = http_service.get_client()
+    resp = await client.post(
+        "https://id.twitch.tv/oauth2/token",
+        params={
+            "client_id": settings.twitch_client_id,
+            "client_secret": settings.twitch_client_secret,
+            "grant_type": "client_credentials",
+        },
+    )
+    resp.raise_for_status()
+    data = resp.json()
+    return data["access_token"], time.time() + data.get("expires_in", 3600) - 60
 
 
 async def _get_app_token() -> str:
@@ -46,64 +61,570 @@ async def _auth_headers(use_app_token: bool = True, use_broadcaster_token: bool
     }
 
 
-async def get_user(channel_login: str) -> Optional[dict]:
-    if channel_login in _user_cache:
-        return _user_cache[channel_login]
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://api.twitch.tv/helix/users",
-            headers=await _auth_headers(),
-            params={"login": channel_login},
-        )
-        if resp.status_code != 200:
-            return None
-        data = resp.json().get("data", [])
-        if not data:
+class HelixError(Exception):
+    """Helix kept answering 429/5xx (or was unreachable) after all retries."""
+
+
+class _Budget:
+    def __init__(self, limit: int, remaining: int, reset_at: float) -> None:
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = reset_at
+
+
+class _HelixScheduler:
+    """Front door for every Helix call.
+
+    Tracks the Ratelimit-* budget per token from response headers. Background calls wait while the
+    budget is at or below background_reserve (or while an interactive call is waiting); interactive
+    calls only wait once it's exhausted. 429s and, for idempotent methods, 5xx/network errors are
+    retried with jittered backoff.
+    """
+
+    def __init__(self, background_reserve: int, max_retries: int) -> None:
+        self.background_reserve = background_reserve
+        self.max_retries = max_retries
+        self._budgets: Dict[str, _Budget] = {}
+        self._changed = asyncio.Condition()
+        self._interactive_waiting = 0
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+
+    def _wait_time(self, budget: Optional[_Budget], priority: int, now: float) -> float:
+        if priority == BACKGROUND and self._interactive_waiting:
+            return RETRY_MAX_SECONDS  # woken early once the interactive call goes out
+        if budget is None:
+            return 0.0
+        if now >= budget.reset_at:
+            budget.remaining = budget.limit
+        floor = 0 if priority == INTERACTIVE else self.background_reserve
+        if budget.remaining > floor:
+            return 0.0
+        return max(0.05, budget.reset_at - now)
+
+    async def _acquire(self, key: str, priority: int) -> None:
+        async with self._changed:
+            waiting = False
+            try:
+                while True:
+                    budget = self._budgets.get(key)
+                    wait = self._wait_time(budget, priority, time.time())
+                    if wait <= 0:
+                        if budget is not None:
+                            budget.remaining -= 1
+                        return
+                    if priority == INTERACTIVE and not waiting:
+                        waiting = True
+                        self._interactive_waiting += 1
+                    self.throttled += 1
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                if waiting:
+                    self._interactive_waiting -= 1
+                    self._changed.notify_all()
+
+    async def _update(self, key: str, resp: httpx.Response) -> None:
+        try:
+            limit = int(resp.headers["Ratelimit-Limit"])
+            remaining = int(resp.headers["Ratelimit-Remaining"])
+            reset_at = float(resp.headers["Ratelimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        async with self._changed:
+            self._budgets[key] = _Budget(limit, remaining, reset_at)
+            self._changed.notify_all()
+
+    def _backoff(self, attempt: int, resp: Optional[httpx.Response] = None) -> float:
+        if resp is not None and resp.status_code == 429 and "Ratelimit-Reset" in resp.headers:
+            try:
+                delay = float(resp.headers["Ratelimit-Reset"]) - time.time()
+            except ValueError:
+                delay = RETRY_BASE_SECONDS * 2**attempt
+        else:
+            delay = RETRY_BASE_SECONDS * 2**attempt
+        delay = min(RETRY_MAX_SECONDS, max(0.0, delay))
+        return delay / 2 + random.uniform(0, delay / 2 + RETRY_BASE_SECONDS)
+
+    async def request(
+        self, method: str, url: str, priority: int = INTERACTIVE, retries: Optional[int] = None, **kwargs
+    ) -> httpx.Response:
+        key = kwargs.get("headers", {}).get("Authorization", "")
+        max_retries = self.max_retries if retries is None else retries
+        idempotent = method.upper() != "POST"
+        attempt = 0
+        while True:
+            await self._acquire(key, priority)
+            self.requests += 1
+            try:
+                resp = await http_service.get_client().request(method, url, **kwargs)
+            except httpx.TransportError as exc:
+                retryable = idempotent or isinstance(exc, httpx.ConnectError)
+                if not retryable or attempt >= max_retries:
+                    raise HelixError(f"{method} {url}: {exc!r}") from exc
+                resp = None
+            else:
+                await self._update(key, resp)
+                if resp.status_code == 429:
+                    self.rate_limited += 1
+                elif resp.status_code >= 500:
+                    self.server_errors += 1
+                    if not idempotent:
+                        return resp
+                else:
+                    return resp
+                if attempt >= max_retries:
+                    return resp
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt, resp))
+            attempt += 1
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "rate_limited": self.rate_limited,
+            "server_errors": self.server_errors,
+            "interactive_waiting": self._interactive_waiting,
+            # one entry per token; the tokens themselves are not exposed
+            "budgets": [
+                {"limit": b.limit, "remaining": b.remaining, "reset_in": round(max(0.0, b.reset_at - now), 1)}
+                for b in self._budgets.values()
+            ],
+        }
+
+
+_helix = _HelixScheduler(settings.helix_background_reserve, settings.helix_max_retries)
+metrics_service.register("helix_scheduler", _helix.stats)
+
+
+def _is_retryable_failure(resp: httpx.Response) -> bool:
+    return resp.status_code == 429 or resp.status_code >= 500
+
+
+class _BatchLoader:
+    """Gathers keys requested within a short window into one fetch of up to HELIX_MAX_IDS keys.
+
+    Concurrent loads of the same key share a single future, whether it's still queued or in flight.
+    A batch goes out at the most urgent priority of the callers in it.
+    """
+
+    def __init__(self, name: str, fetch: Callable[[List[str], int], Awaitable[Dict[str, dict]]]) -> None:
+        self.name = name
+        self._fetch = fetch
+        self._queued: Dict[str, asyncio.Future] = {}
+        self._queued_priority = BACKGROUND
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.requests = 0
+        self.keys_fetched = 0
+        self.shared = 0
+
+    async def load(self, key: str, priority: int = INTERACTIVE) -> Optional[dict]:
+        future = self._queued.get(key) or self._in_flight.get(key)
+        if future is not None:
+            self.shared += 1
+            if key in self._queued:
+                self._queued_priority = min(self._queued_priority, priority)
+        else:
+            loop = asyncio.get_running_loop()
+            future = self._queued[key] = loop.create_future()
+            self._queued_priority = min(self._queued_priority, priority)
+            if len(self._queued) >= HELIX_MAX_IDS:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(BATCH_WINDOW_SECONDS, self._dispatch)
+        # shield: one caller being cancelled must not cancel the lookup for everyone else
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[str], priority: int = INTERACTIVE) -> Dict[str, Optional[dict]]:
+        keys = list(dict.fromkeys(keys))
+        results = await asyncio.gather(*(self.load(key, priority) for key in keys))
+        return dict(zip(keys, results))
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._queued = self._queued, {}
+        priority, self._queued_priority = self._queued_priority, BACKGROUND
+        self._in_flight.update(batch)
+        asyncio.create_task(self._run(batch, priority))
+
+    async def _run(self, batch: Dict[str, asyncio.Future], priority: int) -> None:
+        self.requests += 1
+        self.keys_fetched += len(batch)
+        try:
+            results = await self._fetch(list(batch), priority)
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+        else:
+            for key, future in batch.items():
+                if not future.done():
+                    future.set_result(results.get(key))
+        finally:
+            for key, future in batch.items():
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "keys_fetched": self.keys_fetched,
+            "shared": self.shared,
+            "queued": len(self._queued),
+            "in_flight": len(self._in_flight),
+        }
+
+
+async def _helix_get_many(
+    path: str, param: str, values: List[str], key_field: str, priority: int = INTERACTIVE, paginated: bool = False
+) -> Dict[str, dict]:
+    params = [(param, value) for value in values]
+    if paginated:
+        # Paginated endpoints default to 20 results a page; the others don't accept `first`
+        params.append(("first", str(HELIX_MAX_IDS)))
+    resp = await _helix.request(
+        "GET",
+        f"https://api.twitch.tv/helix/{path}",
+        priority=priority,
+        headers=await _auth_headers(),
+        params=params,
+    )
+    if _is_retryable_failure(resp):
+        raise HelixError(f"GET /helix/{path}: HTTP {resp.status_code}")
+    if resp.status_code != 200:
+        return {}
+    return {item[key_field]: item for item in resp.json().get("data", [])}
+
+
+class _UserCache:
+    """LRU of Helix user objects by login, each valid for ttl seconds.
+
+    New lookups are written to twitch_users as they're fetched; save() records recency on shutdown
+    so load() can warm the hottest entries on the next start.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # login -> (user, fetched_at, last_used_at)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def get(self, login: str) -> Optional[dict]:
+        entry = self._entries.get(login)
+        now = time.time()
+        if entry is None or now - entry[1] >= self.ttl:
+            if entry is not None:
+                del self._entries[login]
+            self.misses += 1
             return None
-        _user_cache[channel_login] = data[0]
-        return data[0]
+        self._entries[login] = (entry[0], entry[1], now)
+        self._entries.move_to_end(login)
+        self.hits += 1
+        return entry[0]
+
+    def peek(self, login: str) -> Optional[dict]:
+        entry = self._entries.get(login)
+        return entry[0] if entry else None
+
+    def _insert(self, login: str, user: dict, fetched_at: float, last_used_at: float) -> None:
+        self._entries[login] = (user, fetched_at, last_used_at)
+        self._entries.move_to_end(login)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+
+    async def put_many(self, users: Dict[str, dict]) -> None:
+        if not users:
+            return
+        now = time.time()
+        for login, user in users.items():
+            self._insert(login, user, now, now)
+        async with database.transaction() as db:
+            await db.executemany(
+                """
+                INSERT INTO twitch_users(login, user_id, data_json, fetched_at, last_used_at) VALUES(?,?,?,?,?)
+                ON CONFLICT(login) DO UPDATE SET user_id=excluded.user_id, data_json=excluded.data_json,
+                fetched_at=excluded.fetched_at, last_used_at=excluded.last_used_at
+                """,
+                [(login, user["id"], json.dumps(user), int(now), int(now)) for login, user in users.items()],
+            )
+
+    async def load(self) -> None:
+        async with database.get_read_db() as db:
+            async with db.execute(
+                """
+                SELECT login, data_json, fetched_at, last_used_at FROM twitch_users
+                WHERE fetched_at > ? ORDER BY last_used_at DESC LIMIT ?
+                """,
+                (int(time.time() - self.ttl), self.max_size),
+            ) as cursor:
+                rows = await cursor.fetchall()
+        self._entries.clear()
+        for row in reversed(rows):  # least recently used first, so LRU order survives the restart
+            self._insert(row["login"], json.loads(row["data_json"]), row["fetched_at"], row["last_used_at"])
+
+    async def save(self) -> None:
+        async with database.transaction() as db:
+            await db.executemany(
+                "UPDATE twitch_users SET last_used_at=? WHERE login=?",
+                [(int(last_used_at), login) for login, (_, _, last_used_at) in self._entries.items()],
+            )
+            await db.execute("DELETE FROM twitch_users WHERE fetched_at <= ?", (int(time.time() - self.ttl),))
+            await db.execute(
+                "DELETE FROM twitch_users WHERE login NOT IN "
+                "(SELECT login FROM twitch_users ORDER BY last_used_at DESC LIMIT ?)",
+                (self.max_size,),
+            )
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evicted": self.evicted,
+        }
+
+
+_users = _UserCache(settings.user_cache_size, settings.user_cache_ttl_seconds)
+metrics_service.register("user_cache", _users.stats)
+
+
+async def load_user_cache() -> None:
+    await _users.load()
+
+
+async def save_user_cache() -> None:
+    await _users.save()
+
+
+async def _fetch_users(logins: List[str], priority: int) -> Dict[str, dict]:
+    return await _helix_get_many("users", "login", logins, "login", priority)
+
+
+async def _fetch_streams(user_ids: List[str], priority: int) -> Dict[str, dict]:
+    return await _helix_get_many("streams", "user_id", user_ids, "user_id", priority, paginated=True)
+
+
+async def _fetch_channels(broadcaster_ids: List[str], priority: int) -> Dict[str, dict]:
+    return await _helix_get_many("channels", "broadcaster_id", broadcaster_ids, "broadcaster_id", priority)
+
+
+_user_loader = _BatchLoader("users", _fetch_users)
+_stream_loader = _BatchLoader("streams", _fetch_streams)
+_channel_loader = _BatchLoader("channels", _fetch_channels)
+metrics_service.register(
+    "helix_batches", lambda: {l.name: l.stats() for l in (_user_loader, _stream_loader, _channel_loader)}
+)
+
+
+class _TTLCache:
+    """Per-broadcaster cache that serves stale values while a background refresh runs.
+
+    Fresh for ttl seconds; for a further stale_ttl seconds the old value is returned immediately and
+    one refresh is started. Older entries are treated as misses and fetched inline.
+    """
+
+    def __init__(self, name: str, ttl: float, stale_ttl: float) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: Dict[str, tuple] = {}  # key -> (value, fetched_at)
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(self._refresh(key, fetch))
+                return value
+        self.misses += 1
+        value = await fetch()
+        self.put(key, value)
+        return value
+
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Optional[dict]]]) -> None:
+        try:
+            self.put(key, await fetch())
+        except Exception:
+            pass  # keep serving the stale value; the next get retries
+        finally:
+            self._refreshing.pop(key, None)
+
+    def put(self, key: str, value: Optional[dict]) -> None:
+        self._entries[key] = (value, time.monotonic())
+
+    def invalidate(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else None,
+            "refreshing": len(self._refreshing),
+        }
+
+
+_stream_cache = _TTLCache("streams", settings.helix_stream_ttl_seconds, settings.helix_stale_seconds)
+_channel_cache = _TTLCache("channels", settings.helix_channel_ttl_seconds, settings.helix_stale_seconds)
+metrics_service.register("helix_cache", lambda: {c.name: c.stats() for c in (_stream_cache, _channel_cache)})
+
+
+def _invalidate_broadcaster(broadcaster_id: str, channel_login: str) -> None:
+    ids = {broadcaster_id}
+    user = _users.peek(channel_login.lower())
+    if user:
+        ids.add(user["id"])
+    for key in ids:
+        _stream_cache.invalidate(key)
+        _channel_cache.invalidate(key)
+
+
+async def _lookup_user(channel_login: str, priority: int = INTERACTIVE) -> Optional[dict]:
+    """Like get_user, but raises HelixError instead of reporting a failed lookup as unknown."""
+    channel_login = channel_login.lower()
+    user = _users.get(channel_login)
+    if user is not None:
+        return user
+    user = await _user_loader.load(channel_login, priority)
+    if user:
+        await _users.put_many({channel_login: user})
+    return user
+
+
+async def get_user(channel_login: str, priority: int = INTERACTIVE) -> Optional[dict]:
+    try:
+        return await _lookup_user(channel_login, priority)
+    except HelixError:
+        log.warning("Helix user lookup failed for %s", channel_login, exc_info=True)
+        return None
+
+
+async def get_users(logins: Iterable[str], priority: int = INTERACTIVE) -> Dict[str, dict]:
+    """Resolve many logins at once; unknown logins are left out of the result."""
+    found: Dict[str, dict] = {}
+    missing = []
+    for login in {login.lower() for login in logins}:
+        user = _users.get(login)
+        if user is not None:
+            found[login] = user
+        else:
+            missing.append(login)
+    fetched = {login: user for login, user in (await _user_loader.load_many(missing, priority)).items() if user}
+    await _users.put_many(fetched)
+    found.update(fetched)
+    return found
+
+
+async def get_stream(user_id: str, priority: int = INTERACTIVE) -> Optional[dict]:
+    """Live stream for a broadcaster id, or None when offline (cached briefly).
+
+    Raises HelixError when Twitch can't answer, rather than reporting the channel offline.
+    """
+    return await _stream_cache.get(user_id, lambda: _stream_loader.load(user_id, priority))
+
+
+async def get_streams(user_ids: Iterable[str], priority: int = INTERACTIVE) -> Dict[str, Optional[dict]]:
+    """Live streams keyed by broadcaster id (None when offline), fetched 100 ids per request.
+
+    Always goes to Helix, and refreshes the stream cache with what it finds.
+    """
+    streams = await _stream_loader.load_many(user_ids, priority)
+    for user_id, stream in streams.items():
+        _stream_cache.put(user_id, stream)
+    return streams
+
+
+def invalidate_stream(user_id: str) -> None:
+    """Drop a cached stream lookup, e.g. when EventSub says the stream went on/offline."""
+    _stream_cache.invalidate(user_id)
+
+
+async def create_eventsub_subscription(
+    type_: str, version: str, condition: dict, session_id: str
+) -> Tuple[int, dict]:
+    """Subscribe a WebSocket session to an event; returns (status, body).
+
+    WebSocket transports require a user token. A 429 here usually means the session's cost cap is
+    used up rather than the rate limit, so it is returned as-is instead of retried.
+    """
+    resp = await _helix.request(
+        "POST",
+        "https://api.twitch.tv/helix/eventsub/subscriptions",
+        retries=0,
+        headers=await _auth_headers(use_app_token=False),
+        json={
+            "type": type_,
+            "version": version,
+            "condition": condition,
+            "transport": {"method": "websocket", "session_id": session_id},
+        },
+    )
+    try:
+        body = resp.json()
+    except ValueError:
+        body = {}
+    return resp.status_code, body if isinstance(body, dict) else {}
 
 
 async def get_user_creation(login: str) -> Optional[str]:
-    login = login.lower()
-    if login in _creation_cache:
-        return _creation_cache[login]
     user = await get_user(login)
     if not user:
         return None
-    created_at = user.get("created_at")
-    if created_at:
-        _creation_cache[login] = created_at
-    return created_at
+    return user.get("created_at")
 
 
 async def get_stream_uptime(channel_login: str) -> str:
     user = await get_user(channel_login)
     if not user:
         return "offline"
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://api.twitch.tv/helix/streams",
-            headers=await _auth_headers(),
-            params={"user_id": user["id"]},
-        )
-        if resp.status_code != 200:
-            return "offline"
-        data = resp.json().get("data", [])
-        if not data:
-            return "offline"
-        started_at = data[0]["started_at"]
-        # Basic human diff
-        from datetime import datetime, timezone
-
-        started = datetime.fromisoformat(started_at.replace("Z", "+00:00"))
-        diff = datetime.now(timezone.utc) - started
-        hours, remainder = divmod(diff.seconds, 3600)
-        minutes = remainder // 60
-        days = diff.days
-        if days > 0:
-            return f"live for {days}d {hours}h {minutes}m"
-        return f"live for {hours}h {minutes}m"
+    try:
+        stream = await get_stream(user["id"])
+    except HelixError:
+        return "uptime unavailable right now"
+    if not stream:
+        return "offline"
+    started_at = stream["started_at"]
+    # Basic human diff
+    from datetime import datetime, timezone
+
+    started = datetime.fromisoformat(started_at.replace("Z", "+00:00"))
+    diff = datetime.now(timezone.utc) - started
+    hours, remainder = divmod(diff.seconds, 3600)
+    minutes = remainder // 60
+    days = diff.days
+    if days > 0:
+        return f"live for {days}d {hours}h {minutes}m"
+    return f"live for {hours}h {minutes}m"
 
 
 def _humanize_duration(seconds: int) -> str:
@@ -132,66 +653,58 @@ async def get_account_age(login: str) -> Optional[str]:
 
 
 async def get_follow_duration(follower_login: str, broadcaster_login: str) -> Optional[str]:
-    follower = await get_user(follower_login)
-    broadcaster = await get_user(broadcaster_login)
+    follower, broadcaster = await asyncio.gather(get_user(follower_login), get_user(broadcaster_login))
     if not follower or not broadcaster:
         return None
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
+    try:
+        resp = await _helix.request(
+            "GET",
             "https://api.twitch.tv/helix/users/follows",
             headers=await _auth_headers(),
             params={"from_id": follower["id"], "to_id": broadcaster["id"]},
         )
-        if resp.status_code != 200:
-            return None
-        data = resp.json().get("data", [])
-        if not data:
-            return None
-        followed_at = data[0].get("followed_at")
-        if not followed_at:
-            return None
-        from datetime import datetime, timezone
+    except HelixError:
+        log.warning("Helix follow lookup failed for %s", follower_login, exc_info=True)
+        return None
+    if resp.status_code != 200:
+        return None
+    data = resp.json().get("data", [])
+    if not data:
+        return None
+    followed_at = data[0].get("followed_at")
+    if not followed_at:
+        return None
+    from datetime import datetime, timezone
 
-        followed = datetime.fromisoformat(followed_at.replace("Z", "+00:00"))
-        now = datetime.now(timezone.utc)
-        seconds = int((now - followed).total_seconds())
-        return _humanize_duration(seconds)
+    followed = datetime.fromisoformat(followed_at.replace("Z", "+00:00"))
+    now = datetime.now(timezone.utc)
+    seconds = int((now - followed).total_seconds())
+    return _humanize_duration(seconds)
 
 
 async def get_channel_info(channel_login: str) -> Optional[dict]:
     user = await get_user(channel_login)
     if not user:
         return None
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://api.twitch.tv/helix/channels",
-            headers=await _auth_headers(),
-            params={"broadcaster_id": user["id"]},
-        )
-        if resp.status_code != 200:
-            return None
-        data = resp.json().get("data", [])
-        return data[0] if data else None
+    broadcaster_id = user["id"]
+    try:
+        return await _channel_cache.get(broadcaster_id, lambda: _channel_loader.load(broadcaster_id))
+    except HelixError:
+        log.warning("Helix channel lookup failed for %s", channel_login, exc_info=True)
+        return None
 
 
-async def get_stream_status(channel_login: str) -> tuple[bool, Optional[str], Optional[str]]:
-    """Return (is_live, title, game_name)."""
-    user = await get_user(channel_login)
+async def get_stream_status(
+    channel_login: str, priority: int = INTERACTIVE
+) -> tuple[bool, Optional[str], Optional[str]]:
+    """Return (is_live, title, game_name); raises HelixError if Twitch can't say."""
+    user = await _lookup_user(channel_login, priority)
     if not user:
         return False, None, None
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            "https://api.twitch.tv/helix/streams",
-            headers=await _auth_headers(),
-            params={"user_id": user["id"]},
-        )
-        if resp.status_code != 200:
-            return False, None, None
-        data = resp.json().get("data", [])
-        if not data:
-            return False, None, None
-        stream = data[0]
-        return True, stream.get("title"), stream.get("game_name")
+    stream = await get_stream(user["id"], priority)
+    if not stream:
+        return False, None, None
+    return True, stream.get("title"), stream.get("game_name")
 
 
 async def set_channel_game(channel_login: str, game_name: str) -> bool:
@@ -201,23 +714,37 @@ async def set_channel_game(channel_login: str, game_name: str) -> bool:
         broadcaster_id = user["id"] if user else None
     if not broadcaster_id:
         return False
-    async with httpx.AsyncClient() as client:
-        search = await client.get(
+    try:
+        search = await _helix.request(
+            "GET",
             "https://api.twitch.tv/helix/games",
             headers=await _auth_headers(),
             params={"name": game_name},
         )
-        game_data = search.json().get("data", [])
-        if not game_data:
-            return False
-        game_id = game_data[0]["id"]
-        resp = await client.patch(
+    except HelixError:
+        log.warning("Helix game search failed for %r", game_name, exc_info=True)
+        return False
+    if search.status_code != 200:
+        return False
+    game_data = search.json().get("data", [])
+    if not game_data:
+        return False
+    game_id = game_data[0]["id"]
+    try:
+        resp = await _helix.request(
+            "PATCH",
             "https://api.twitch.tv/helix/channels",
             headers=await _auth_headers(use_app_token=False, use_broadcaster_token=True),
             params={"broadcaster_id": broadcaster_id},
             json={"game_id": game_id},
         )
-        return resp.status_code in (200, 204)
+    except HelixError:
+        log.warning("Helix game update failed for %s", channel_login, exc_info=True)
+        return False
+    if resp.status_code not in (200, 204):
+        return False
+    _invalidate_broadcaster(broadcaster_id, channel_login)
+    return True
 
 
 async def set_channel_title(channel_login: str, title: str) -> bool:
@@ -227,22 +754,30 @@ async def set_channel_title(channel_login: str, title: str) -> bool:
         broadcaster_id = user["id"] if user else None
     if not broadcaster_id:
         return False
-    async with httpx.AsyncClient() as client:
-        resp = await client.patch(
+    try:
+        resp = await _helix.request(
+            "PATCH",
             "https://api.twitch.tv/helix/channels",
             headers=await _auth_headers(use_app_token=False, use_broadcaster_token=True),
             params={"broadcaster_id": broadcaster_id},
             json={"title": title[:140]},
         )
-        return resp.status_code in (200, 204)
+    except HelixError:
+        log.warning("Helix title update failed for %s", channel_login, exc_info=True)
+        return False
+    if resp.status_code not in (200, 204):
+        return False
+    _invalidate_broadcaster(broadcaster_id, channel_login)
+    return True
 
 
 async def start_poll(title: str, choices: list[str], duration: int = 120) -> bool:
     broadcaster_id = settings.twitch_broadcaster_id or settings.twitch_bot_id
     if not broadcaster_id:
         return False
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
+    try:
+        resp = await _helix.request(
+            "POST",
             "https://api.twitch.tv/helix/polls",
             headers=await _auth_headers(use_app_token=False, use_broadcaster_token=True),
             json={
@@ -252,15 +787,19 @@ async def start_poll(title: str, choices: list[str], duration: int = 120) -> boo
                 "duration": max(15, min(duration, 1800)),
             },
         )
-        return resp.status_code in (200, 201)
+    except HelixError:
+        log.warning("Helix poll creation failed", exc_info=True)
+        return False
+    return resp.status_code in (200, 201)
 
 
 async def start_prediction(title: str, outcomes: list[str], duration: int = 120) -> bool:
     broadcaster_id = settings.twitch_broadcaster_id or settings.twitch_bot_id
     if not broadcaster_id:
         return False
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
+    try:
+        resp = await _helix.request(
+            "POST",
             "https://api.twitch.tv/helix/predictions",
             headers=await _auth_headers(use_app_token=False, use_broadcaster_token=True),
             json={
@@ -270,17 +809,24 @@ async def start_prediction(title: str, outcomes: list[str], duration: int = 120)
                 "prediction_window": max(30, min(duration, 1800)),
             },
         )
-        return resp.status_code in (200, 201)
+    except HelixError:
+        log.warning("Helix prediction creation failed", exc_info=True)
+        return False
+    return resp.status_code in (200, 201)
 
 
 async def create_stream_marker(description: str) -> bool:
     broadcaster_id = settings.twitch_broadcaster_id or settings.twitch_bot_id
     if not broadcaster_id:
         return False
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
+    try:
+        resp = await _helix.request(
+            "POST",
             "https://api.twitch.tv/helix/streams/markers",
             headers=await _auth_headers(use_app_token=False, use_broadcaster_token=True),
             json={"user_id": broadcaster_id, "description": description[:140]},
         )
-        return resp.status_code in (200, 201)
+    except HelixError:
+        log.warning("Helix stream marker creation failed", exc_info=True)
+        return False
+    return resp.status_code in (200, 201)
@@ -19,8 +19,40 @@ class Settings:
     web_secret_key: str = "dev-secret"
     base_url: str = "http://localhost:8000"
     sqlite_path: str = "./jishbot.db"
+    sqlite_readers: int = 3  # read-only connections for dashboard/cache loads; 0 = use the writer
+    sqlite_cache_kib: int = 16384  # page cache per connection
+    sqlite_busy_timeout_ms: int = 5000
+    dashboard_cache_seconds: float = 5.0  # rendered dashboard reuse; config edits invalidate it immediately
     log_level: str = "INFO"
-    message_delay_seconds: float = 1.6  # Twitch limit ~20 msgs / 30s per channel
+    # Outbound chat messages per 30s: per channel as a regular user / as mod or broadcaster, and account-wide
+    chat_rate_user: int = 20
+    chat_rate_mod: int = 100
+    chat_rate_global: int = 100
+    outbound_queue_max: int = 50  # per channel
+    outbound_coalesce: bool = False
+    infraction_flush_rows: int = 50
+    infraction_flush_ms: int = 500
+    infraction_retention_days: int = 30  # raw rows older than this are deleted; hourly rollups are kept; 0 = keep all
+    infraction_prune_batch: int = 500
+    hot_counter_flush_ms: int = 0  # 0 = write every ${count} increment immediately
+    hot_counter_max_pending: int = 100
+    # Shared HTTP client used for Helix and webhooks
+    http_max_connections: int = 20
+    http_max_keepalive: int = 10
+    http_keepalive_seconds: float = 30.0
+    http_timeout_seconds: float = 10.0
+    http_connect_timeout_seconds: float = 5.0
+    # Helix stream/channel info cache; stale values are served for helix_stale_seconds while refreshing
+    helix_stream_ttl_seconds: float = 30.0
+    helix_channel_ttl_seconds: float = 60.0
+    helix_stale_seconds: float = 300.0
+    helix_background_reserve: int = 100  # rate-limit points kept back for chat commands
+    helix_max_retries: int = 3
+    eventsub_enabled: bool = True
+    eventsub_ws_url: str = "wss://eventsub.wss.twitch.tv/ws"
+    notification_reconcile_seconds: float = 600.0  # full poll of channels EventSub already covers
+    user_cache_size: int = 5000  # Helix user objects kept in memory (and in twitch_users)
+    user_cache_ttl_seconds: float = 86400.0
 
     @staticmethod
     def load() -> "Settings":
@@ -40,7 +72,37 @@ class Settings:
             web_secret_key=os.getenv("WEB_SECRET_KEY", "dev-secret"),
             base_url=os.getenv("BASE_URL", "http://localhost:8000"),
             sqlite_path=os.getenv("SQLITE_PATH", "./jishbot.db"),
+            sqlite_readers=int(os.getenv("SQLITE_READERS", "3")),
+            sqlite_cache_kib=int(os.getenv("SQLITE_CACHE_KIB", "16384")),
+            sqlite_busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+            dashboard_cache_seconds=float(os.getenv("DASHBOARD_CACHE_SECONDS", "5")),
             log_level=os.getenv("LOG_LEVEL", "INFO"),
+            chat_rate_user=int(os.getenv("CHAT_RATE_USER", "20")),
+            chat_rate_mod=int(os.getenv("CHAT_RATE_MOD", "100")),
+            chat_rate_global=int(os.getenv("CHAT_RATE_GLOBAL", "100")),
+            outbound_queue_max=int(os.getenv("OUTBOUND_QUEUE_MAX", "50")),
+            outbound_coalesce=os.getenv("OUTBOUND_COALESCE", "0").lower() in ("1", "true", "yes"),
+            infraction_flush_rows=int(os.getenv("INFRACTION_FLUSH_ROWS", "50")),
+            infraction_flush_ms=int(os.getenv("INFRACTION_FLUSH_MS", "500")),
+            infraction_retention_days=int(os.getenv("INFRACTION_RETENTION_DAYS", "30")),
+            infraction_prune_batch=int(os.getenv("INFRACTION_PRUNE_BATCH", "500")),
+            hot_counter_flush_ms=int(os.getenv("HOT_COUNTER_FLUSH_MS", "0")),
+            hot_counter_max_pending=int(os.getenv("HOT_COUNTER_MAX_PENDING", "100")),
+            http_max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "20")),
+            http_max_keepalive=int(os.getenv("HTTP_MAX_KEEPALIVE", "10")),
+            http_keepalive_seconds=float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30")),
+            http_timeout_seconds=float(os.getenv("HTTP_TIMEOUT_SECONDS", "10")),
+            http_connect_timeout_seconds=float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5")),
+            helix_stream_ttl_seconds=float(os.getenv("HELIX_STREAM_TTL_SECONDS", "30")),
+            helix_channel_ttl_seconds=float(os.getenv("HELIX_CHANNEL_TTL_SECONDS", "60")),
+            helix_stale_seconds=float(os.getenv("HELIX_STALE_SECONDS", "300")),
+            helix_background_reserve=int(os.getenv("HELIX_BACKGROUND_RESERVE", "100")),
+            helix_max_retries=int(os.getenv("HELIX_MAX_RETRIES", "3")),
+            eventsub_enabled=os.getenv("EVENTSUB_ENABLED", "1").lower() in ("1", "true", "yes"),
+            eventsub_ws_url=os.getenv("EVENTSUB_WS_URL", "wss://eventsub.wss.twitch.tv/ws"),
+            notification_reconcile_seconds=float(os.getenv("NOTIFICATION_RECONCILE_SECONDS", "600")),
+            user_cache_size=int(os.getenv("USER_CACHE_SIZE", "5000")),
+            user_cache_ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "86400")),
         )
 
 
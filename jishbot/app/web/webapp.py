@@ -1,15 +1,26 @@
-from typing import List, Optional
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 from pathlib import Path
 from urllib.parse import quote_plus
 
 from fastapi import Depends, FastAPI, Form, Header, HTTPException, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
 
 from jishbot.app.db import database
-from jishbot.app.services import giveaways_service
+from jishbot.app.services import (
+    filters_service,
+    giveaways_service,
+    infractions_service,
+    metrics_service,
+    permissions_service,
+    timers_service,
+)
 from jishbot.app.settings import settings
 
 app = FastAPI(title="JishBot Dashboard")
@@ -37,6 +48,11 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/metrics", dependencies=[Depends(verify_token)])
+async def metrics():
+    return metrics_service.snapshot()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     return RedirectResponse("/dashboard")
@@ -62,56 +78,94 @@ async def get_channels() -> List[str]:
     channels = settings.twitch_channels
     if channels:
         return channels
-    db = await database.get_db()
-    async with db.execute("SELECT channel_name FROM channels WHERE is_enabled=1") as cursor:
-        rows = await cursor.fetchall()
-        return [row["channel_name"].lstrip("#").lower() for row in rows]
+    async with database.get_read_db() as db:
+        async with db.execute("SELECT channel_name FROM channels WHERE is_enabled=1") as cursor:
+            rows = await cursor.fetchall()
+            return [row["channel_name"].lstrip("#").lower() for row in rows]
 
 
-@app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(request: Request, channel: Optional[str] = None, notice: Optional[str] = None):
-    if not is_authed(request):
-        return auth_redirect()
-    channels = await get_channels()
-    active_channel = (channel or (channels[0] if channels else "")).lstrip("#").lower()
-    from jishbot.app.services import notifications_service
-    db = await database.get_db()
-    # Commands
-    async with db.execute(
-        "SELECT name, response, permission, cooldown_global, cooldown_user FROM commands WHERE channel_id=? ORDER BY name",
-        (active_channel,),
-    ) as cursor:
-        commands_rows = await cursor.fetchall()
-    # Timers
+DEFAULT_LINK_SETTINGS = {
+    "enabled": True,
+    "allow_mod": True,
+    "allow_sub": True,
+    "allow_regular": True,
+    "allowed_domains": [],
+}
+RENDER_CACHE_MAX = 256
+
+# (channel, channel list, notice) -> (expires_at, stamp, etag, body)
+_render_cache: "OrderedDict[tuple, Tuple[float, tuple, str, bytes]]" = OrderedDict()
+
+
+async def _fetch_all(sql: str, params: tuple) -> list:
+    async with database.get_read_db() as db:
+        async with db.execute(sql, params) as cursor:
+            return await cursor.fetchall()
+
+
+async def _fetch_one(sql: str, params: tuple):
+    async with database.get_read_db() as db:
+        async with db.execute(sql, params) as cursor:
+            return await cursor.fetchone()
+
+
+async def _render_stamp(channel: str) -> tuple:
+    """Changes whenever anything on the page would: config version, giveaway entries, infractions."""
+    since = infractions_service.window_start()
+    row = await _fetch_one(
+        """
+        SELECT (SELECT version FROM channel_config WHERE channel_id=?) AS version,
+               (SELECT COUNT(*) FROM giveaway_entries WHERE channel_id=?) AS entries,
+               (SELECT COALESCE(SUM(count), 0) FROM infraction_rollups WHERE channel_id=? AND hour>=?) AS infractions
+        """,
+        (channel, channel, channel, since),
+    )
+    return (row["version"] or 0, row["entries"], row["infractions"], since)
+
+
+async def _load_dashboard(channel: str) -> dict:
+    """Everything the dashboard shows, one query per section, run concurrently on the read pool."""
     import json
 
-    async with db.execute(
-        "SELECT id, name, messages_json, interval_minutes, require_chat_activity, enabled FROM timers WHERE channel_id=?",
-        (active_channel,),
-    ) as cursor:
-        timer_rows = await cursor.fetchall()
-        timers = [
-            {
-                "id": row["id"],
-                "name": row["name"],
-                "messages": json.loads(row["messages_json"]),
-                "interval_minutes": row["interval_minutes"],
-                "require_chat_activity": bool(row["require_chat_activity"]),
-                "enabled": bool(row["enabled"]),
-            }
-            for row in timer_rows
-        ]
-    # Filters
-    async with db.execute(
-        "SELECT id, type, pattern, enabled FROM filters WHERE channel_id=?", (active_channel,)
-    ) as cursor:
-        filters = await cursor.fetchall()
-    # Link settings
-    async with db.execute(
-        "SELECT enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json FROM link_settings WHERE channel_id=?",
-        (active_channel,),
-    ) as cursor:
-        link_row = await cursor.fetchone()
+    from jishbot.app.services import notifications_service
+
+    results = await asyncio.gather(
+        _fetch_all(
+            "SELECT name, response, permission, cooldown_global, cooldown_user FROM commands WHERE channel_id=? ORDER BY name",
+            (channel,),
+        ),
+        _fetch_all(
+            "SELECT name, messages_json, interval_minutes, require_chat_activity, enabled FROM timers WHERE channel_id=?",
+            (channel,),
+        ),
+        _fetch_all("SELECT id, type, pattern, enabled FROM filters WHERE channel_id=?", (channel,)),
+        _fetch_one(
+            "SELECT enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json FROM link_settings WHERE channel_id=?",
+            (channel,),
+        ),
+        _fetch_one(
+            """
+            SELECT is_active, keyword,
+                   (SELECT COUNT(*) FROM giveaway_entries e WHERE e.channel_id=g.channel_id) AS entry_count
+            FROM giveaways g WHERE channel_id=?
+            """,
+            (channel,),
+        ),
+        notifications_service.get_webhook(channel),
+        infractions_service.get_stats(channel),
+    )
+    commands, timer_rows, filters, link_row, giveaway_row, webhook_url, infraction_stats = results
+    timers = [
+        {
+            "name": row["name"],
+            "messages": json.loads(row["messages_json"]),
+            "interval_minutes": row["interval_minutes"],
+            "require_chat_activity": bool(row["require_chat_activity"]),
+            "enabled": bool(row["enabled"]),
+        }
+        for row in timer_rows
+    ]
+    link_settings = dict(DEFAULT_LINK_SETTINGS)
     if link_row:
         link_settings = {
             "enabled": bool(link_row["enabled"]),
@@ -120,54 +174,67 @@ async def dashboard(request: Request, channel: Optional[str] = None, notice: Opt
             "allow_regular": bool(link_row["allow_regular"]),
             "allowed_domains": json.loads(link_row["allowed_domains_json"] or "[]"),
         }
-    else:
-        link_settings = {
-            "enabled": True,
-            "allow_mod": True,
-            "allow_sub": True,
-            "allow_regular": True,
-            "allowed_domains": [],
-        }
-    # Giveaway
-    async with db.execute(
-        "SELECT is_active, keyword, entries_json FROM giveaways WHERE channel_id=?", (active_channel,)
-    ) as cursor:
-        giveaway_row = await cursor.fetchone()
     giveaway = None
     if giveaway_row:
         giveaway = {
             "is_active": bool(giveaway_row["is_active"]),
             "keyword": giveaway_row["keyword"],
-            "entries": json.loads(giveaway_row["entries_json"] or "[]"),
+            "entry_count": giveaway_row["entry_count"],
         }
-    webhook_url = await notifications_service.get_webhook(active_channel)
-    return templates.TemplateResponse(
+    return {
+        "commands": commands,
+        "timers": timers,
+        "filters": filters,
+        "links": link_settings,
+        "giveaway": giveaway,
+        "webhook_url": webhook_url,
+        "infraction_stats": infraction_stats,
+    }
+
+
+def _etag_response(request: Request, etag: str, body: bytes) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(body, headers=headers)
+
+
+@app.get("/dashboard", response_class=HTMLResponse)
+async def dashboard(request: Request, channel: Optional[str] = None, notice: Optional[str] = None):
+    if not is_authed(request):
+        return auth_redirect()
+    channels = await get_channels()
+    active_channel = (channel or (channels[0] if channels else "")).lstrip("#").lower()
+    stamp = await _render_stamp(active_channel)
+    key = (active_channel, tuple(channels), notice or "")
+    cached = _render_cache.get(key)
+    if cached and cached[0] > time.monotonic() and cached[1] == stamp:
+        return _etag_response(request, cached[2], cached[3])
+    data = await _load_dashboard(active_channel)
+    rendered = templates.TemplateResponse(
         "dashboard.html",
-        {
-            "request": request,
-            "channels": channels,
-            "channel": active_channel,
-            "commands": commands_rows,
-            "timers": timers,
-            "filters": filters,
-            "links": link_settings,
-            "giveaway": giveaway,
-            "webhook_url": webhook_url,
-            "notice": notice,
-        },
+        {"request": request, "channels": channels, "channel": active_channel, "notice": notice, **data},
     )
+    body = bytes(rendered.body)
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    if settings.dashboard_cache_seconds > 0:
+        _render_cache[key] = (time.monotonic() + settings.dashboard_cache_seconds, stamp, etag, body)
+        _render_cache.move_to_end(key)
+        while len(_render_cache) > RENDER_CACHE_MAX:
+            _render_cache.popitem(last=False)
+    return _etag_response(request, etag, body)
 
 
 @app.get("/api/commands/{channel}", dependencies=[Depends(verify_token)])
 async def get_commands(channel: str):
     channel = channel.lower()
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT name, response, permission, cooldown_global, cooldown_user FROM commands WHERE channel_id=?",
-        (channel,),
-    ) as cursor:
-        rows = await cursor.fetchall()
-        return [dict(r) for r in rows]
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT name, response, permission, cooldown_global, cooldown_user FROM commands WHERE channel_id=?",
+            (channel,),
+        ) as cursor:
+            rows = await cursor.fetchall()
+            return [dict(r) for r in rows]
 
 
 @app.post("/api/commands/{channel}", dependencies=[Depends(verify_token)])
@@ -193,6 +260,10 @@ class FilterIn(BaseModel):
     enabled: bool = True
 
 
+class RegularIn(BaseModel):
+    user_name: str
+
+
 class LinkSettingsIn(BaseModel):
     enabled: bool = True
     allow_mod: bool = True
@@ -203,13 +274,13 @@ class LinkSettingsIn(BaseModel):
 
 @app.get("/api/commands/{channel}", dependencies=[Depends(verify_token)])
 async def get_commands(channel: str):
-    db = await database.get_db()
-    async with db.execute(
-        "SELECT name, response, permission, cooldown_global, cooldown_user FROM commands WHERE channel_id=?",
-        (channel,),
-    ) as cursor:
-        rows = await cursor.fetchall()
-        return [dict(r) for r in rows]
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT name, response, permission, cooldown_global, cooldown_user FROM commands WHERE channel_id=?",
+            (channel,),
+        ) as cursor:
+            rows = await cursor.fetchall()
+            return [dict(r) for r in rows]
 
 
 @app.post("/api/commands/{channel}", dependencies=[Depends(verify_token)])
@@ -235,110 +306,97 @@ async def delete_command(channel: str, name: str):
 @app.get("/api/timers/{channel}", dependencies=[Depends(verify_token)])
 async def get_timers(channel: str):
     channel = channel.lower()
-    db = await database.get_db()
     import json
 
-    async with db.execute(
-        "SELECT id, name, messages_json, interval_minutes, require_chat_activity, enabled FROM timers WHERE channel_id=?",
-        (channel,),
-    ) as cursor:
-        rows = await cursor.fetchall()
-        output = []
-        for row in rows:
-            output.append(
-                {
-                    "id": row["id"],
-                    "name": row["name"],
-                    "messages": json.loads(row["messages_json"]),
-                    "interval_minutes": row["interval_minutes"],
-                    "require_chat_activity": bool(row["require_chat_activity"]),
-                    "enabled": bool(row["enabled"]),
-                }
-            )
-        return output
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT id, name, messages_json, interval_minutes, require_chat_activity, enabled FROM timers WHERE channel_id=?",
+            (channel,),
+        ) as cursor:
+            rows = await cursor.fetchall()
+            output = []
+            for row in rows:
+                output.append(
+                    {
+                        "id": row["id"],
+                        "name": row["name"],
+                        "messages": json.loads(row["messages_json"]),
+                        "interval_minutes": row["interval_minutes"],
+                        "require_chat_activity": bool(row["require_chat_activity"]),
+                        "enabled": bool(row["enabled"]),
+                    }
+                )
+            return output
 
 
 @app.post("/api/timers/{channel}", dependencies=[Depends(verify_token)])
 async def create_timer(channel: str, payload: TimerIn):
     channel = channel.lower()
-    db = await database.get_db()
     import json
 
-    await db.execute(
-        """
-        INSERT INTO timers(channel_id, name, messages_json, interval_minutes, require_chat_activity, enabled)
-        VALUES(?,?,?,?,?,?)
-        ON CONFLICT(channel_id, name) DO UPDATE SET messages_json=excluded.messages_json,
-            interval_minutes=excluded.interval_minutes,
-            require_chat_activity=excluded.require_chat_activity,
-            enabled=excluded.enabled
-        """,
-        (
-            channel,
-            payload.name,
-            json.dumps(payload.messages),
-            payload.interval_minutes,
-            1 if payload.require_chat_activity else 0,
-            1 if payload.enabled else 0,
-        ),
-    )
-    await db.commit()
+    async with database.transaction() as db:
+        await db.execute(
+            """
+            INSERT INTO timers(channel_id, name, messages_json, interval_minutes, require_chat_activity, enabled)
+            VALUES(?,?,?,?,?,?)
+            ON CONFLICT(channel_id, name) DO UPDATE SET messages_json=excluded.messages_json,
+                interval_minutes=excluded.interval_minutes,
+                require_chat_activity=excluded.require_chat_activity,
+                enabled=excluded.enabled
+            """,
+            (
+                channel,
+                payload.name,
+                json.dumps(payload.messages),
+                payload.interval_minutes,
+                1 if payload.require_chat_activity else 0,
+                1 if payload.enabled else 0,
+            ),
+        )
+    await timers_service.timers_service.reload(channel)
     return {"ok": True}
 
 
 @app.delete("/api/timers/{channel}/{name}", dependencies=[Depends(verify_token)])
 async def delete_timer(channel: str, name: str):
     channel = channel.lower()
-    db = await database.get_db()
-    await db.execute("DELETE FROM timers WHERE channel_id=? AND name=?", (channel, name))
-    await db.commit()
+    async with database.transaction() as db:
+        await db.execute("DELETE FROM timers WHERE channel_id=? AND name=?", (channel, name))
+    await timers_service.timers_service.reload(channel)
     return {"ok": True}
 
 
 @app.get("/api/filters/{channel}", dependencies=[Depends(verify_token)])
 async def get_filters(channel: str):
     channel = channel.lower()
-    db = await database.get_db()
-    async with db.execute("SELECT id, type, pattern, enabled FROM filters WHERE channel_id=?", (channel,)) as cursor:
-        rows = await cursor.fetchall()
-        return [dict(r) for r in rows]
+    return await filters_service.list_filters(channel)
 
 
 @app.post("/api/filters/{channel}", dependencies=[Depends(verify_token)])
 async def create_filter(channel: str, payload: FilterIn):
     channel = channel.lower()
-    db = await database.get_db()
-    await db.execute(
-        """
-        INSERT INTO filters(channel_id, type, pattern, enabled)
-        VALUES(?,?,?,?)
-        """,
-        (channel, payload.type, payload.pattern, 1 if payload.enabled else 0),
-    )
-    await db.commit()
+    await filters_service.add_filter(channel, payload.type, payload.pattern, payload.enabled)
     return {"ok": True}
 
 
 @app.delete("/api/filters/{channel}/{filter_id}", dependencies=[Depends(verify_token)])
 async def delete_filter(channel: str, filter_id: int):
     channel = channel.lower()
-    db = await database.get_db()
-    await db.execute("DELETE FROM filters WHERE channel_id=? AND id=?", (channel, filter_id))
-    await db.commit()
+    await filters_service.delete_filter(channel, filter_id)
     return {"ok": True}
 
 
 @app.get("/api/links/{channel}", dependencies=[Depends(verify_token)])
 async def get_links(channel: str):
     channel = channel.lower()
-    db = await database.get_db()
     import json
 
-    async with db.execute(
-        "SELECT enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json FROM link_settings WHERE channel_id=?",
-        (channel,),
-    ) as cursor:
-        row = await cursor.fetchone()
+    async with database.get_read_db() as db:
+        async with db.execute(
+            "SELECT enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json FROM link_settings WHERE channel_id=?",
+            (channel,),
+        ) as cursor:
+            row = await cursor.fetchone()
     if not row:
         return {
             "enabled": True,
@@ -359,38 +417,58 @@ async def get_links(channel: str):
 @app.post("/api/links/{channel}", dependencies=[Depends(verify_token)])
 async def set_links(channel: str, payload: LinkSettingsIn):
     channel = channel.lower()
-    db = await database.get_db()
     import json
 
-    await db.execute(
-        """
-        INSERT INTO link_settings(channel_id, enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json)
-        VALUES(?,?,?,?,?,?)
-        ON CONFLICT(channel_id) DO UPDATE SET
-            enabled=excluded.enabled,
-            allow_mod=excluded.allow_mod,
-            allow_sub=excluded.allow_sub,
-            allow_regular=excluded.allow_regular,
-            allowed_domains_json=excluded.allowed_domains_json
-        """,
-        (
-            channel,
-            1 if payload.enabled else 0,
-            1 if payload.allow_mod else 0,
-            1 if payload.allow_sub else 0,
-            1 if payload.allow_regular else 0,
-            json.dumps(payload.allowed_domains),
-        ),
-    )
-    await db.commit()
+    async with database.transaction() as db:
+        await db.execute(
+            """
+            INSERT INTO link_settings(channel_id, enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json)
+            VALUES(?,?,?,?,?,?)
+            ON CONFLICT(channel_id) DO UPDATE SET
+                enabled=excluded.enabled,
+                allow_mod=excluded.allow_mod,
+                allow_sub=excluded.allow_sub,
+                allow_regular=excluded.allow_regular,
+                allowed_domains_json=excluded.allowed_domains_json
+            """,
+            (
+                channel,
+                1 if payload.enabled else 0,
+                1 if payload.allow_mod else 0,
+                1 if payload.allow_sub else 0,
+                1 if payload.allow_regular else 0,
+                json.dumps(payload.allowed_domains),
+            ),
+        )
+    return {"ok": True}
+
+
+@app.get("/api/regulars/{channel}", dependencies=[Depends(verify_token)])
+async def get_regulars(channel: str):
+    channel = channel.lower()
+    return await permissions_service.list_regulars(channel)
+
+
+@app.post("/api/regulars/{channel}", dependencies=[Depends(verify_token)])
+async def add_regular(channel: str, payload: RegularIn):
+    channel = channel.lower()
+    await permissions_service.add_regular(channel, payload.user_name.lstrip("@"))
+    return {"ok": True}
+
+
+@app.delete("/api/regulars/{channel}/{user_name}", dependencies=[Depends(verify_token)])
+async def remove_regular(channel: str, user_name: str):
+    channel = channel.lower()
+    await permissions_service.remove_regular(channel, user_name)
     return {"ok": True}
 
 
 @app.get("/api/giveaways/{channel}", dependencies=[Depends(verify_token)])
-async def get_giveaway(channel: str):
+async def get_giveaway(channel: str, limit: Optional[int] = None, offset: int = 0):
     channel = channel.lower()
     return {
-        "entries": await giveaways_service.get_entries(channel),
+        "count": await giveaways_service.count_entries(channel),
+        "entries": await giveaways_service.get_entries(channel, limit, offset),
     }
 
 
@@ -408,6 +486,11 @@ async def end_giveaway(channel: str):
     return {"ok": True}
 
 
+@app.get("/api/infractions/{channel}/stats", dependencies=[Depends(verify_token)])
+async def infraction_stats(channel: str, hours: int = 24):
+    return await infractions_service.get_stats(channel.lower(), min(max(hours, 1), 24 * 90))
+
+
 # ----- HTML form handlers -----
 
 
@@ -463,27 +546,27 @@ async def dashboard_save_timer(
     channel = channel.lower()
     import json
 
-    db = await database.get_db()
     msgs = [m.strip() for m in messages.splitlines() if m.strip()]
-    await db.execute(
-        """
-        INSERT INTO timers(channel_id, name, messages_json, interval_minutes, require_chat_activity, enabled)
-        VALUES(?,?,?,?,?,?)
-        ON CONFLICT(channel_id, name) DO UPDATE SET messages_json=excluded.messages_json,
-            interval_minutes=excluded.interval_minutes,
-            require_chat_activity=excluded.require_chat_activity,
-            enabled=excluded.enabled
-        """,
-        (
-            channel,
-            name,
-            json.dumps(msgs),
-            interval_minutes,
-            1 if require_chat_activity else 0,
-            1 if enabled else 0,
-        ),
-    )
-    await db.commit()
+    async with database.transaction() as db:
+        await db.execute(
+            """
+            INSERT INTO timers(channel_id, name, messages_json, interval_minutes, require_chat_activity, enabled)
+            VALUES(?,?,?,?,?,?)
+            ON CONFLICT(channel_id, name) DO UPDATE SET messages_json=excluded.messages_json,
+                interval_minutes=excluded.interval_minutes,
+                require_chat_activity=excluded.require_chat_activity,
+                enabled=excluded.enabled
+            """,
+            (
+                channel,
+                name,
+                json.dumps(msgs),
+                interval_minutes,
+                1 if require_chat_activity else 0,
+                1 if enabled else 0,
+            ),
+        )
+    await timers_service.timers_service.reload(channel)
     return redirect_to_dashboard(channel, f"Timer {name} saved")
 
 
@@ -492,9 +575,9 @@ async def dashboard_delete_timer(request: Request, channel: str, name: str):
     if not is_authed(request):
         return auth_redirect()
     channel = channel.lower()
-    db = await database.get_db()
-    await db.execute("DELETE FROM timers WHERE channel_id=? AND name=?", (channel, name))
-    await db.commit()
+    async with database.transaction() as db:
+        await db.execute("DELETE FROM timers WHERE channel_id=? AND name=?", (channel, name))
+    await timers_service.timers_service.reload(channel)
     return redirect_to_dashboard(channel, f"Timer {name} deleted")
 
 
@@ -509,12 +592,7 @@ async def dashboard_save_filter(
     if not is_authed(request):
         return auth_redirect()
     channel = channel.lower()
-    db = await database.get_db()
-    await db.execute(
-        "INSERT INTO filters(channel_id, type, pattern, enabled) VALUES(?,?,?,?)",
-        (channel, type, pattern, 1 if enabled else 0),
-    )
-    await db.commit()
+    await filters_service.add_filter(channel, type, pattern, bool(enabled))
     return redirect_to_dashboard(channel, "Filter added")
 
 
@@ -523,9 +601,7 @@ async def dashboard_delete_filter(request: Request, channel: str, filter_id: int
     if not is_authed(request):
         return auth_redirect()
     channel = channel.lower()
-    db = await database.get_db()
-    await db.execute("DELETE FROM filters WHERE channel_id=? AND id=?", (channel, filter_id))
-    await db.commit()
+    await filters_service.delete_filter(channel, filter_id)
     return redirect_to_dashboard(channel, "Filter deleted")
 
 
@@ -545,28 +621,27 @@ async def dashboard_save_links(
     import json
 
     domains = [d.strip() for d in allowed_domains.split(",") if d.strip()]
-    db = await database.get_db()
-    await db.execute(
-        """
-        INSERT INTO link_settings(channel_id, enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json)
-        VALUES(?,?,?,?,?,?)
-        ON CONFLICT(channel_id) DO UPDATE SET
-            enabled=excluded.enabled,
-            allow_mod=excluded.allow_mod,
-            allow_sub=excluded.allow_sub,
-            allow_regular=excluded.allow_regular,
-            allowed_domains_json=excluded.allowed_domains_json
-        """,
-        (
-            channel,
-            1 if enabled else 0,
-            1 if allow_mod else 0,
-            1 if allow_sub else 0,
-            1 if allow_regular else 0,
-            json.dumps(domains),
-        ),
-    )
-    await db.commit()
+    async with database.transaction() as db:
+        await db.execute(
+            """
+            INSERT INTO link_settings(channel_id, enabled, allow_mod, allow_sub, allow_regular, allowed_domains_json)
+            VALUES(?,?,?,?,?,?)
+            ON CONFLICT(channel_id) DO UPDATE SET
+                enabled=excluded.enabled,
+                allow_mod=excluded.allow_mod,
+                allow_sub=excluded.allow_sub,
+                allow_regular=excluded.allow_regular,
+                allowed_domains_json=excluded.allowed_domains_json
+            """,
+            (
+                channel,
+                1 if enabled else 0,
+                1 if allow_mod else 0,
+                1 if allow_sub else 0,
+                1 if allow_regular else 0,
+                json.dumps(domains),
+            ),
+        )
     return redirect_to_dashboard(channel, "Link settings saved")
 
 
@@ -0,0 +1,89 @@
+"""Fail if a query the app issues stops using an index.
+
+Collects every SQL string literal under jishbot/app (outside the migrations), builds a throwaway
+database with the current migrations and runs EXPLAIN QUERY PLAN over each one, so new queries
+are covered without editing this file. Run after touching the schema or a query:
+
+    python -m jishbot.scripts.check_query_plans
+"""
+
+import ast
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+import aiosqlite
+
+from jishbot.app.db import migrations
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+SKIP = {APP_DIR / "db" / "migrations.py"}
+SQL_RE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b.*\b(FROM|INTO|SET)\b", re.S)
+
+# Whole-table statements by design (normalised SQL -> why); everything else must not SCAN.
+ALLOWED_SCANS = {
+    "SELECT channel_id, user_id, user_name FROM regulars": "loads every regular once at startup",
+    "DELETE FROM twitch_users WHERE login NOT IN (SELECT login FROM twitch_users ORDER BY last_used_at DESC LIMIT ?)": (
+        "trims the user cache table to its size cap on shutdown"
+    ),
+}
+
+
+def _normalise(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def collect_queries() -> List[Tuple[str, str]]:
+    """(location, sql) for each distinct SQL literal in the app."""
+    seen = {}
+    for path in sorted(APP_DIR.rglob("*.py")):
+        if path in SKIP:
+            continue
+        tree = ast.parse(path.read_text(), filename=str(path))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and SQL_RE.match(node.value):
+                sql = _normalise(node.value)
+                seen.setdefault(sql, f"{path.relative_to(APP_DIR.parent)}:{node.lineno}")
+    return [(location, sql) for sql, location in seen.items()]
+
+
+async def _plan(db: aiosqlite.Connection, sql: str) -> list:
+    async with db.execute("EXPLAIN QUERY PLAN " + sql, [None] * sql.count("?")) as cursor:
+        return [row[3] for row in await cursor.fetchall()]
+
+
+async def main() -> int:
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db = await aiosqlite.connect(os.path.join(tmp, "plans.db"))
+        db.row_factory = aiosqlite.Row
+        try:
+            await migrations.ensure_schema(db)
+            await db.execute("ANALYZE")
+            for location, sql in collect_queries():
+                details = await _plan(db, sql)
+                scans = [d for d in details if d.startswith("SCAN") and "USING" not in d and d != "SCAN CONSTANT ROW"]
+                if not scans:
+                    status = "ok"
+                elif sql in ALLOWED_SCANS:
+                    status = "scan"
+                else:
+                    status = "FAIL"
+                    failures += 1
+                print(f"{status:4} {location}: {'; '.join(details) or 'no table access'}")
+                if status == "FAIL":
+                    print(f"     {sql}")
+        finally:
+            await db.close()
+    if failures:
+        print(f"{failures} queries fell back to a table scan", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))